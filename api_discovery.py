@@ -0,0 +1,66 @@
+"""
+Ermittelt die aktuell in Super League (C1) und Challenge League (C2)
+gemeldeten Spieler über die Transfermarkt-API.
+
+Eigenes Modul, damit `discover` ohne die Aggregation (NumPy) startet.
+"""
+from http_client import api_get
+from fetch_engine import API_RPS, TokenBucket, fetch_all
+
+SWISS_COMPETITIONS = ("C1", "C2")
+
+
+def fetch_competition_club_ids(comp_id):
+    """Club ids listed for one competition (runs in a worker thread)."""
+    r = api_get(f"/competitions/{comp_id}/clubs", "competition_clubs")
+    if r.status_code != 200:
+        print(f"❌ Clubs API failed for {comp_id}: HTTP {r.status_code}")
+        return []
+    clubs = (r.json() or {}).get("clubs") or []
+    print(f"ℹ️ Competition {comp_id}: {len(clubs)} clubs")
+    return [str(club.get("id") or "").strip() for club in clubs if str(club.get("id") or "").strip()]
+
+
+def fetch_club_player_ids(club_id):
+    """Player ids in one club's squad (runs in a worker thread)."""
+    rp = api_get(f"/clubs/{club_id}/players", "club_players")
+    if rp.status_code != 200:
+        print(f"❌ Players API failed for club {club_id}: HTTP {rp.status_code}")
+        return []
+    players = (rp.json() or {}).get("players") or []
+    return [int(p["id"]) for p in players if p.get("id") is not None and str(p["id"]).isdigit()]
+
+
+def iter_swiss_ids_via_api(limiter=None):
+    """
+    Stream currently listed player ids for Swiss Super League (C1) and
+    Challenge League (C2) via API, each id once, as club squads arrive.
+    Competitions and squads are fetched in parallel under `limiter`.
+    """
+    limiter = limiter or TokenBucket(API_RPS)
+
+    def _club_ids():
+        seen_clubs = set()
+        for comp_id, club_ids in fetch_all(SWISS_COMPETITIONS, fetch_competition_club_ids, limiter=limiter):
+            if isinstance(club_ids, Exception):
+                print(f"❌ Clubs API exception for {comp_id}: {club_ids}")
+                continue
+            for club_id in club_ids:
+                if club_id not in seen_clubs:
+                    seen_clubs.add(club_id)
+                    yield club_id
+
+    seen = set()
+    for club_id, player_ids in fetch_all(_club_ids(), fetch_club_player_ids, limiter=limiter):
+        if isinstance(player_ids, Exception):
+            print(f"❌ Players API exception for club {club_id}: {player_ids}")
+            continue
+        for pid in player_ids:
+            if pid not in seen:
+                seen.add(pid)
+                yield pid
+
+
+def get_current_swiss_ids_via_api():
+    """All currently listed C1/C2 player ids (see `iter_swiss_ids_via_api`)."""
+    return set(iter_swiss_ids_via_api())
@@ -1,30 +1,144 @@
 """
 Holt Spieler-Statistiken (Tore, Vorlagen, Einsätze) über die Transfermarkt-API.
 """
+import datetime
+import hashlib
+import itertools
+import json
 import os
+import threading
+
+import numpy as np
 import requests
 
-API_BASE = os.getenv("API_BASE", "http://localhost:8000")
+import metrics
+import payload_archive
+from http_client import API_BASE, api_get
+from fetch_engine import fetch_all
+from retry_queue import PERMANENT_STATUSES
+from schema import ensure_club_cache_table
+
+CLUB_NAME_TTL_DAYS = int(os.getenv("CLUB_NAME_TTL_DAYS", "90"))
+CLUB_NAME_NEGATIVE_TTL_DAYS = int(os.getenv("CLUB_NAME_NEGATIVE_TTL_DAYS", "2"))
+
 _club_name_cache = {}
+_club_cache_pending = {}
+_club_cache_lock = threading.Lock()
+# Club ids answered with the Verein_{id} placeholder after a transient lookup
+# failure, i.e. a later lookup may still resolve them (permanent ones, e.g. a
+# 404 profile, keep the placeholder without being listed here)
+_unresolved_clubs = set()
+# Known names past CLUB_NAME_TTL_DAYS: looked up again, but kept when that lookup fails
+_stale_club_names = {}
+# Set for offline rebuilds: unknown club ids get the placeholder name, no request
+_offline = False
+
+
+def load_club_cache(conn) -> int:
+    """
+    Preload all non-expired club names (positive and negative) into memory.
+    Expired names are kept aside as the fallback of their refresh lookup.
+    """
+    cur = conn.cursor()
+    ensure_club_cache_table(cur)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    fresh_ok = (now - datetime.timedelta(days=CLUB_NAME_TTL_DAYS)).isoformat(timespec="seconds")
+    fresh_fail = (now - datetime.timedelta(days=CLUB_NAME_NEGATIVE_TTL_DAYS)).isoformat(timespec="seconds")
+    cur.execute(
+        "SELECT club_id, name, ok, status FROM club_names "
+        "WHERE (ok = 1 AND fetched_at >= ?) OR (ok = 0 AND fetched_at >= ?)",
+        (fresh_ok, fresh_fail)
+    )
+    rows = cur.fetchall()
+    cur.execute("SELECT club_id, name FROM club_names WHERE ok = 1 AND fetched_at < ?", (fresh_ok,))
+    stale = cur.fetchall()
+    with _club_cache_lock:
+        _stale_club_names.update(stale)
+        for club_id, name, ok, status in rows:
+            _club_name_cache[club_id] = name if ok else f"Verein_{club_id}"
+            if not ok and status not in PERMANENT_STATUSES:
+                _unresolved_clubs.add(club_id)
+    metrics.incr("club_cache.preloaded", len(rows))
+    return len(rows)
+
+
+def use_offline_club_names(names: dict):
+    """Seed the cache with club_id -> name and stop looking up unknown ids over the network."""
+    global _offline
+    with _club_cache_lock:
+        _club_name_cache.update({club_id: name for club_id, name in names.items() if name})
+    _offline = True
+
+
+def save_club_cache(conn) -> int:
+    """Persist club lookups made since the last save. Call from the DB-writer thread."""
+    with _club_cache_lock:
+        pending = list(_club_cache_pending.items())
+        _club_cache_pending.clear()
+    if not pending:
+        return 0
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    conn.executemany(
+        "INSERT INTO club_names (club_id, name, ok, fetched_at, status) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(club_id) DO UPDATE SET name=excluded.name, ok=excluded.ok, fetched_at=excluded.fetched_at, "
+        "status=excluded.status",
+        [(club_id, name, ok, now, status) for club_id, (name, ok, status) in pending]
+    )
+    return len(pending)
+
 
-def _get_club_name(club_id: str, timeout: int = 15) -> str:
+def _remember_club_name(club_id: str, name: str | None, status: int | None = None) -> str:
+    """Cache a lookup result; `status` is the HTTP status of a failed lookup (None: no answer)."""
+    value = name or f"Verein_{club_id}"
+    with _club_cache_lock:
+        _club_name_cache[club_id] = value
+        _club_cache_pending[club_id] = (name, 1 if name else 0, None if name else status)
+        if name or status in PERMANENT_STATUSES:
+            _unresolved_clubs.discard(club_id)
+        else:
+            _unresolved_clubs.add(club_id)
+    return value
+
+
+def _get_club_name(club_id: str, limiter=None) -> str:
+    """Cached club name; a lookup first takes a token from `limiter` when given."""
     if not club_id:
         return "Unknown"
-    if club_id in _club_name_cache:
-        return _club_name_cache[club_id]
+    cached = _club_name_cache.get(club_id)
+    if cached is not None:
+        metrics.incr("club_cache.hits")
+        return cached
+    metrics.incr("club_cache.misses")
+    if _offline:
+        # Cached (not persisted), so batch resolution does not retry it under the rate limit
+        with _club_cache_lock:
+            return _club_name_cache.setdefault(club_id, f"Verein_{club_id}")
+    if limiter is not None:
+        with metrics.timed("rate_limit_wait"):
+            limiter.acquire()
+    status = None
     try:
-        resp = requests.get(f"{API_BASE}/clubs/{club_id}/profile", timeout=timeout)
+        resp = api_get(f"/clubs/{club_id}/profile", "club_profile")
+        status = resp.status_code
         if resp.status_code == 200:
             data = resp.json()
+            payload_archive.record(payload_archive.CLUB_PROFILE, club_id, data, datetime.date.today().isoformat())
             name = data.get("name")
             if name:
-                _club_name_cache[club_id] = name
-                return name
+                return _remember_club_name(club_id, name)
+            # A profile without a name will not grow one on the next lookup
+            status = 404
     except Exception:
-        pass
-    fallback = f"Verein_{club_id}"
-    _club_name_cache[club_id] = fallback
-    return fallback
+        # Unparseable answer: worth another lookup later
+        status = None
+    stale = _stale_club_names.get(club_id)
+    if stale:
+        # Failed refresh: keep serving the known name, in memory only, so the stored
+        # row keeps its old fetched_at and the next run tries the refresh again
+        metrics.incr("club_cache.stale_served")
+        with _club_cache_lock:
+            return _club_name_cache.setdefault(club_id, stale)
+    return _remember_club_name(club_id, None, status)
 
 def _season_id_to_name(season_id: str) -> str:
     try:
@@ -55,55 +169,266 @@ def _safe_int(val, default=0):
     except (ValueError, TypeError):
         return default
 
-def get_player_stats(tm_id: int) -> dict | None:
+def stats_fingerprint(data: dict) -> str:
+    """Stable hash of the stats rows of a /players/{id}/stats payload."""
+    rows = (data or {}).get("stats") or []
+    blob = json.dumps(rows, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+class PlayerStatsError(RuntimeError):
+    """A failed stats fetch; `error` is the structured {"error", "status", "detail"} dict."""
+
+    def __init__(self, tm_id: int, error: dict):
+        super().__init__(f"player {tm_id}: {error['error']} status={error['status']} {error['detail']}")
+        self.error = error
+
+def _fetch_error(kind: str, status: int | None = None, detail: str = "") -> dict:
+    return {"error": kind, "status": status, "detail": (detail or "").replace("\n", " ")[:240]}
+
+def fetch_player_stats_payload(tm_id: int, etag: str | None = None, last_modified: str | None = None) -> dict:
+    """
+    Raw /players/{id}/stats request. Sends If-None-Match / If-Modified-Since when
+    validators are known. Returns {"error": None, "not_modified", "data", "etag",
+    "last_modified"}, or on failure {"error": kind, "status", "detail"} with kind
+    "http_status", "timeout", "connection" or "parse" (after the HTTP-layer retries).
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    try:
+        resp = api_get(f"/players/{tm_id}/stats", "player_stats", headers=headers)
+    except requests.Timeout as e:
+        return _fetch_error("timeout", detail=str(e))
+    except requests.RequestException as e:
+        return _fetch_error("connection", detail=str(e))
+    if resp.status_code == 304:
+        return {"error": None, "not_modified": True, "data": None, "etag": etag, "last_modified": last_modified}
+    if resp.status_code != 200:
+        return _fetch_error("http_status", resp.status_code, resp.text)
     try:
-        resp = requests.get(f"{API_BASE}/players/{tm_id}/stats", timeout=20)
-        if resp.status_code != 200:
-            return None
         data = resp.json()
-        stats_list = data.get("stats") or []
-        if not stats_list:
-            return {"e": 0, "t": 0, "a": 0, "club_goals": {}, "club_assists": {}, "club_appearances": {}, "club_yellow_cards": {}, "club_red_cards": {}, "club_last_season_year": {}, "season_goals": {}, "season_assists": {}, "leagues": []}
-        total_e = total_t = total_a = 0
-        club_goals = {}
-        club_assists = {}
-        club_appearances = {}
-        club_yellow_cards = {}
-        club_red_cards = {}
-        club_last_season_year = {}
-        season_goals = {}
-        season_assists = {}
-        leagues_seen = set()
-        for stat in stats_list:
-            apps = _safe_int(stat.get("appearances"))
-            goals = _safe_int(stat.get("goals"))
-            assists = _safe_int(stat.get("assists"))
-            yellows = _safe_int(stat.get("yellowCards") or stat.get("yellow_cards"))
-            second_yellows = _safe_int(stat.get("secondYellowCards") or stat.get("second_yellow_cards"))
-            reds = _safe_int(stat.get("redCards") or stat.get("red_cards"))
-            club_id = str(stat.get("clubId") or stat.get("club_id") or "")
-            season_id = str(stat.get("seasonId") or stat.get("season_id") or "")
-            season_start_year = _season_id_to_start_year(season_id)
-            comp_name = (stat.get("competitionName") or stat.get("competition_name") or "").strip()
-            if comp_name:
-                leagues_seen.add(comp_name)
-            total_e += apps
-            total_t += goals
-            total_a += assists
-            if club_id:
-                club_name = _get_club_name(club_id)
-                club_goals[club_name] = club_goals.get(club_name, 0) + goals
-                club_assists[club_name] = club_assists.get(club_name, 0) + assists
-                club_appearances[club_name] = club_appearances.get(club_name, 0) + apps
-                club_yellow_cards[club_name] = club_yellow_cards.get(club_name, 0) + yellows
-                club_red_cards[club_name] = club_red_cards.get(club_name, 0) + reds + second_yellows
-                if season_start_year is not None:
-                    prev = club_last_season_year.get(club_name)
-                    club_last_season_year[club_name] = season_start_year if prev is None else max(prev, season_start_year)
-            if season_id:
-                sn = _season_id_to_name(season_id)
-                season_goals[sn] = season_goals.get(sn, 0) + goals
-                season_assists[sn] = season_assists.get(sn, 0) + assists
-        return {"e": total_e, "t": total_t, "a": total_a, "club_goals": club_goals, "club_assists": club_assists, "club_appearances": club_appearances, "club_yellow_cards": club_yellow_cards, "club_red_cards": club_red_cards, "club_last_season_year": club_last_season_year, "season_goals": season_goals, "season_assists": season_assists, "leagues": list(leagues_seen)}
+    except ValueError as e:
+        return _fetch_error("parse", resp.status_code, str(e))
+    return {
+        "error": None,
+        "not_modified": False,
+        "data": data,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+    }
+
+def aggregate_player_stats(data: dict, limiter=None) -> dict:
+    """
+    Aggregate one stats payload. `unresolved_clubs` lists the club ids that
+    only got the Verein_{id} placeholder, so the caller can re-aggregate the
+    player once the names resolve.
+    """
+    stats_list = data.get("stats") or []
+    if not stats_list:
+        return {"e": 0, "t": 0, "a": 0, "club_goals": {}, "club_assists": {}, "club_appearances": {}, "club_yellow_cards": {}, "club_red_cards": {}, "club_last_season_year": {}, "season_goals": {}, "season_assists": {}, "leagues": [], "unresolved_clubs": []}
+    total_e = total_t = total_a = 0
+    club_goals = {}
+    club_assists = {}
+    club_appearances = {}
+    club_yellow_cards = {}
+    club_red_cards = {}
+    club_last_season_year = {}
+    season_goals = {}
+    season_assists = {}
+    leagues_seen = set()
+    unresolved = set()
+    for stat in stats_list:
+        apps = _safe_int(stat.get("appearances"))
+        goals = _safe_int(stat.get("goals"))
+        assists = _safe_int(stat.get("assists"))
+        yellows = _safe_int(stat.get("yellowCards") or stat.get("yellow_cards"))
+        second_yellows = _safe_int(stat.get("secondYellowCards") or stat.get("second_yellow_cards"))
+        reds = _safe_int(stat.get("redCards") or stat.get("red_cards"))
+        club_id = str(stat.get("clubId") or stat.get("club_id") or "")
+        season_id = str(stat.get("seasonId") or stat.get("season_id") or "")
+        season_start_year = _season_id_to_start_year(season_id)
+        comp_name = (stat.get("competitionName") or stat.get("competition_name") or "").strip()
+        if comp_name:
+            leagues_seen.add(comp_name)
+        total_e += apps
+        total_t += goals
+        total_a += assists
+        if club_id:
+            club_name = _get_club_name(club_id, limiter)
+            if club_id in _unresolved_clubs:
+                unresolved.add(club_id)
+            club_goals[club_name] = club_goals.get(club_name, 0) + goals
+            club_assists[club_name] = club_assists.get(club_name, 0) + assists
+            club_appearances[club_name] = club_appearances.get(club_name, 0) + apps
+            club_yellow_cards[club_name] = club_yellow_cards.get(club_name, 0) + yellows
+            club_red_cards[club_name] = club_red_cards.get(club_name, 0) + reds + second_yellows
+            if season_start_year is not None:
+                prev = club_last_season_year.get(club_name)
+                club_last_season_year[club_name] = season_start_year if prev is None else max(prev, season_start_year)
+        if season_id:
+            sn = _season_id_to_name(season_id)
+            season_goals[sn] = season_goals.get(sn, 0) + goals
+            season_assists[sn] = season_assists.get(sn, 0) + assists
+    return {"e": total_e, "t": total_t, "a": total_a, "club_goals": club_goals, "club_assists": club_assists, "club_appearances": club_appearances, "club_yellow_cards": club_yellow_cards, "club_red_cards": club_red_cards, "club_last_season_year": club_last_season_year, "season_goals": season_goals, "season_assists": season_assists, "leagues": list(leagues_seen), "unresolved_clubs": sorted(unresolved)}
+
+def resolve_club_names(club_ids, limiter=None) -> dict:
+    """club_id -> name for every id, looking up each uncached id once (in parallel under `limiter`)."""
+    ids = {club_id for club_id in club_ids if club_id}
+    missing = [club_id for club_id in ids if club_id not in _club_name_cache]
+    metrics.incr("club_cache.hits", len(ids) - len(missing))
+    if missing:
+        with metrics.timed("club_resolve"):
+            for _ in fetch_all(missing, _get_club_name, limiter=limiter):
+                pass
+    return {club_id: _club_name_cache.get(club_id) or _get_club_name(club_id, limiter) for club_id in ids}
+
+def _stats_rows(data):
+    """The stats rows of a payload, or None when it is not a dict with a list of row dicts."""
+    if not isinstance(data, dict):
+        return None
+    rows = data.get("stats") or []
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        return None
+    return rows
+
+def _column(rows, key, alt=None):
+    """Row-wise `stat.get(key) or stat.get(alt)`, the lookup of the scalar parser."""
+    values = list(map(dict.get, rows, itertools.repeat(key)))
+    if alt is None:
+        return values
+    return [v or w for v, w in zip(values, map(dict.get, rows, itertools.repeat(alt)))]
+
+def _distinct_keys(values):
+    """Hashable keys for `values`: the values themselves unless mixing bool/int/float would merge 1, 1.0 and True."""
+    if len(set(map(type, values)) & {bool, int, float}) > 1:
+        return list(zip(map(type, values), values))
+    return values
+
+def _codes(values):
+    """Dense codes (first-seen order) and the distinct values."""
+    keys = _distinct_keys(values)
+    index = {key: code for code, key in enumerate(dict.fromkeys(keys))}
+    uniques = list(index) if keys is values else [v for _, v in index]
+    return np.fromiter(map(index.__getitem__, keys), dtype=np.int64, count=len(keys)), uniques
+
+def _map_distinct(values, fn, dtype=object):
+    """Apply scalar `fn` once per distinct value and broadcast the results back."""
+    keys = _distinct_keys(values)
+    if keys is values:
+        lookup = {v: fn(v) for v in dict.fromkeys(values)}
+    else:
+        lookup = {key: fn(key[1]) for key in dict.fromkeys(keys)}
+    return np.array(list(map(lookup.__getitem__, keys)), dtype=dtype)
+
+def _groups(keys):
+    """Sort order, group starts and distinct keys: reduce a column with `ufunc.reduceat(col[order], starts)`."""
+    order = np.argsort(keys, kind="stable")
+    ordered = keys[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    return order, starts, ordered[starts]
+
+def _aggregate_rows(rows_by_tid: dict, limiter=None) -> dict:
+    tids = list(rows_by_tid)
+    out = {tid: aggregate_player_stats({}) for tid in tids}
+    rows = list(itertools.chain.from_iterable(rows_by_tid.values()))
+    if not rows:
+        return out
+    player = np.repeat(np.arange(len(tids), dtype=np.int64), [len(r) for r in rows_by_tid.values()])
+
+    # Columns; the scalar parsers run once per distinct raw value
+    apps = _map_distinct(_column(rows, "appearances"), _safe_int, np.int64)
+    goals = _map_distinct(_column(rows, "goals"), _safe_int, np.int64)
+    assists = _map_distinct(_column(rows, "assists"), _safe_int, np.int64)
+    yellows = _map_distinct(_column(rows, "yellowCards", "yellow_cards"), _safe_int, np.int64)
+    reds = (_map_distinct(_column(rows, "redCards", "red_cards"), _safe_int, np.int64)
+            + _map_distinct(_column(rows, "secondYellowCards", "second_yellow_cards"), _safe_int, np.int64))
+    club_ids = _map_distinct(_column(rows, "clubId", "club_id"), lambda v: str(v or ""))
+    season_ids = _map_distinct(_column(rows, "seasonId", "season_id"), lambda v: str(v or ""))
+    comp_names = _map_distinct(_column(rows, "competitionName", "competition_name"), lambda v: (v or "").strip())
+    start_year = lambda v: -1 if (year := _season_id_to_start_year(v)) is None else year
+
+    order, starts, keys = _groups(player)
+    for p, e, t, a in zip(keys.tolist(), *(np.add.reduceat(col[order], starts).tolist() for col in (apps, goals, assists))):
+        out[tids[p]].update(e=e, t=t, a=a)
+
+    mask = club_ids != ""
+    if mask.any():
+        ids = club_ids[mask].tolist()
+        names = resolve_club_names(set(ids), limiter=limiter)
+        unresolved = {club_id for club_id in names if club_id in _unresolved_clubs}
+        name_codes, club_names = _codes([names[club_id] for club_id in ids])
+        n = len(club_names)
+        order, starts, keys = _groups(player[mask] * n + name_codes)
+        sums = (np.add.reduceat(col[mask][order], starts).tolist() for col in (goals, assists, apps, yellows, reds))
+        last_years = np.maximum.reduceat(_map_distinct(season_ids[mask].tolist(), start_year, np.int64)[order], starts)
+        for key, g, a, e, y, r, last_year in zip(keys.tolist(), *sums, last_years.tolist()):
+            stats, club = out[tids[key // n]], club_names[key % n]
+            stats["club_goals"][club] = g
+            stats["club_assists"][club] = a
+            stats["club_appearances"][club] = e
+            stats["club_yellow_cards"][club] = y
+            stats["club_red_cards"][club] = r
+            if last_year >= 0:
+                stats["club_last_season_year"][club] = last_year
+
+        if unresolved:
+            for key in np.unique(player[mask][np.isin(club_ids[mask], list(unresolved))]).tolist():
+                out[tids[key]]["unresolved_clubs"] = sorted(set(club_ids[(player == key) & mask].tolist()) & unresolved)
+
+    mask = season_ids != ""
+    if mask.any():
+        season_codes, season_names = _codes(_map_distinct(season_ids[mask].tolist(), _season_id_to_name).tolist())
+        n = len(season_names)
+        order, starts, keys = _groups(player[mask] * n + season_codes)
+        sums = (np.add.reduceat(col[mask][order], starts).tolist() for col in (goals, assists))
+        for key, g, a in zip(keys.tolist(), *sums):
+            stats, season = out[tids[key // n]], season_names[key % n]
+            stats["season_goals"][season] = g
+            stats["season_assists"][season] = a
+
+    mask = comp_names != ""
+    if mask.any():
+        comp_codes, leagues = _codes(comp_names[mask].tolist())
+        n = len(leagues)
+        for key in np.unique(player[mask] * n + comp_codes).tolist():
+            out[tids[key // n]]["leagues"].append(leagues[key % n])
+    return out
+
+def aggregate_player_stats_batch(payloads: dict, limiter=None) -> dict:
+    """
+    Aggregate many /players/{id}/stats payloads at once: tm_id -> the same dict
+    `aggregate_player_stats` returns, or None for a payload that cannot be
+    aggregated. Rows of all players become NumPy columns, club/season/league
+    groupings are one sort + reduceat each and club ids are resolved in one
+    deduplicated batch. Malformed payloads are dropped before the batch; if a
+    row value still breaks the batch, its players are aggregated one by one.
+    """
+    rows_by_tid = {tid: _stats_rows(data) for tid, data in payloads.items()}
+    out = {tid: None for tid, rows in rows_by_tid.items() if rows is None}
+    valid = {tid: rows for tid, rows in rows_by_tid.items() if rows is not None}
+    try:
+        out.update(_aggregate_rows(valid, limiter))
     except Exception:
-        return None
\ No newline at end of file
+        for tid in valid:
+            try:
+                out[tid] = aggregate_player_stats(payloads[tid], limiter)
+            except Exception:
+                out[tid] = None
+    return out
+
+def get_player_stats(tm_id: int, limiter=None) -> dict:
+    """
+    Fetch and aggregate one player. Pass the `limiter` the caller's fetch
+    pool uses so the club lookups count against the same budget. Raises
+    PlayerStatsError with the structured error of the fetch, or a "parse"
+    error when the payload cannot be aggregated.
+    """
+    payload = fetch_player_stats_payload(tm_id)
+    if payload["error"]:
+        raise PlayerStatsError(tm_id, payload)
+    try:
+        return aggregate_player_stats(payload["data"], limiter)
+    except Exception as e:
+        raise PlayerStatsError(tm_id, _fetch_error("parse", None, f"stats payload could not be aggregated: {e}")) from e
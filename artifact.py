@@ -0,0 +1,215 @@
+"""
+Basis-Snapshot und zeilenbasierte Deltas statt der vollen DB pro Woche.
+
+Im Repo liegen ein Basis-Snapshot (schweizer_fussball_grid.db) und die
+seither angefallenen Deltas (deltas/*.jsonl.gz). Der aktuelle Stand ist
+immer Snapshot + alle Deltas in Namensreihenfolge; der wöchentliche Lauf
+und jeder Serverstart (`npm start` -> prestart, Python-Abhängigkeiten in
+requirements-deploy.txt) stellen ihn mit `python cli.py apply-delta` her.
+
+`export_delta` vergleicht den vorherigen Stand mit dem neuen Tabelle für
+Tabelle und schreibt nur die geänderten Zeilen als sortiertes,
+gzip-komprimiertes JSONL (deterministisch: gleiche Änderung -> gleiche
+Datei). `apply_deltas` spielt sie ein, merkt sich eingespielte Dateien in
+`applied_deltas` und baut danach den Grid-Index. Erst nach SNAPSHOT_EVERY
+Deltas wird mit `compact_database` ein neuer Snapshot geschrieben (VACUUM,
+Grid-Index bleibt drin) und die Deltas fallen weg; in
+den Wochen dazwischen bleibt die DB-Datei im Repo unverändert, damit git
+nicht jede Woche eine neu gepackte Binärdatei speichert.
+
+Delta-Zeilen:
+    {"op": "schema", "table": t, "sql": ..., "indexes": [...]}  Tabelle (neu) anlegen
+    {"op": "drop", "table": t}
+    {"op": "-", "table": t, "row": [...]}                      Zeile löschen
+    {"op": "+", "table": t, "row": [...]}                      Zeile einfügen
+"""
+import base64
+import glob
+import gzip
+import io
+import json
+import os
+import sqlite3
+
+from grid_index import GRID_INDEX_TABLES, ensure_grid_index_tables, write_grid_index
+
+# Deltas since the last base snapshot before a new snapshot is committed (weekly runs)
+SNAPSHOT_EVERY = int(os.getenv("SNAPSHOT_EVERY", "8"))
+
+# Run bookkeeping of the machine that ran the update (resume journal, retry queue)
+RUN_LOCAL_TABLES = ("update_runs", "update_run_players", "player_retry_queue")
+
+# Not part of the delta: derived (rebuilt on apply) or local bookkeeping
+DELTA_EXCLUDED_TABLES = (*GRID_INDEX_TABLES, *RUN_LOCAL_TABLES, "applied_deltas")
+
+
+def compact_database(path: str, drop_run_state: bool = False) -> tuple:
+    """
+    Turn `path` into a base snapshot: drop `applied_deltas` (its deltas are
+    folded in) and, with `drop_run_state`, the RUN_LOCAL_TABLES; switch to a
+    rollback journal (one self-contained file) and VACUUM. The grid index is
+    kept. Returns (bytes before, bytes after).
+    """
+    before = os.path.getsize(path)
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            for table in ("applied_deltas", *(RUN_LOCAL_TABLES if drop_run_state else ())):
+                conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return before, os.path.getsize(path)
+
+
+def pending_deltas(delta_dir: str) -> list:
+    """Delta files on top of the current snapshot, in the order they apply."""
+    return sorted(glob.glob(os.path.join(delta_dir, "*.jsonl.gz")))
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return {"$b64": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        return base64.b64decode(value["$b64"])
+    return value
+
+
+def _tables(conn, schema) -> dict:
+    rows = conn.execute(
+        f"SELECT name, sql FROM {schema}.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    return {name: sql for name, sql in rows if name not in DELTA_EXCLUDED_TABLES}
+
+
+def _indexes(conn, schema, table) -> list:
+    rows = conn.execute(
+        f"SELECT sql FROM {schema}.sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL ORDER BY name",
+        (table,)
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def _columns(conn, schema, table) -> str:
+    return ", ".join(f'"{r[1]}"' for r in conn.execute(f'PRAGMA {schema}.table_info("{table}")'))
+
+
+def _diff_rows(conn, a, b, table, cols):
+    """Rows of a.table missing from b.table, sorted on every column."""
+    return conn.execute(
+        f'SELECT {cols} FROM {a}."{table}" EXCEPT SELECT {cols} FROM {b}."{table}" ORDER BY {cols}'
+    )
+
+
+def export_delta(old_db: str | None, new_db: str, out_path: str) -> dict:
+    """
+    Write the row-level changes from `old_db` (None: empty DB) to `new_db`
+    as gzip JSONL to `out_path`. Tables and rows are in sorted order and the
+    gzip header carries no timestamp, so the file is byte-for-byte
+    reproducible. Returns {"tables": ..., "inserted": ..., "deleted": ...}.
+    """
+    conn = sqlite3.connect(new_db)
+    conn.execute("ATTACH DATABASE ? AS old", (old_db or ":memory:",))
+    new_tables = _tables(conn, "main")
+    old_tables = _tables(conn, "old")
+    stats = {"tables": 0, "inserted": 0, "deleted": 0}
+    buf = io.StringIO()
+
+    def emit(entry):
+        buf.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    for table in sorted(set(old_tables) | set(new_tables)):
+        changed = 0
+        if table not in new_tables:
+            emit({"op": "drop", "table": table})
+            changed += 1
+        else:
+            cols = _columns(conn, "main", table)
+            # New table or new schema: recreate and send every row
+            recreate = old_tables.get(table) != new_tables[table]
+            if recreate:
+                emit({"op": "schema", "table": table, "sql": new_tables[table], "indexes": _indexes(conn, "main", table)})
+                changed += 1
+            else:
+                for row in _diff_rows(conn, "old", "main", table, cols):
+                    emit({"op": "-", "table": table, "row": [_encode(v) for v in row]})
+                    stats["deleted"] += 1
+                    changed += 1
+            rows = (conn.execute(f'SELECT {cols} FROM main."{table}" ORDER BY {cols}') if recreate
+                    else _diff_rows(conn, "main", "old", table, cols))
+            for row in rows:
+                emit({"op": "+", "table": table, "row": [_encode(v) for v in row]})
+                stats["inserted"] += 1
+                changed += 1
+        stats["tables"] += bool(changed)
+    conn.close()
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0, filename="") as f:
+        f.write(buf.getvalue().encode("utf-8"))
+    return stats
+
+
+def _apply_delta(conn, delta_path: str) -> dict:
+    """Apply one delta file inside the caller's transaction."""
+    stats = {"inserted": 0, "deleted": 0}
+    columns = {}
+    with gzip.open(delta_path, "rt", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            table, op = entry["table"], entry["op"]
+            if op == "drop":
+                conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+            elif op == "schema":
+                conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+                conn.execute(entry["sql"])
+                for sql in entry["indexes"]:
+                    conn.execute(sql)
+            else:
+                if table not in columns:
+                    columns[table] = [r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')]
+                cols = columns[table]
+                row = [_decode(v) for v in entry["row"]]
+                if op == "-":
+                    where = " AND ".join(f'"{c}" IS ?' for c in cols)
+                    stats["deleted"] += conn.execute(f'DELETE FROM "{table}" WHERE {where}', row).rowcount
+                else:
+                    placeholders = ", ".join("?" for _ in cols)
+                    col_list = ", ".join(f'"{c}"' for c in cols)
+                    conn.execute(f'INSERT INTO "{table}" ({col_list}) VALUES ({placeholders})', row)
+                    stats["inserted"] += 1
+    return stats
+
+
+def apply_deltas(db: str, delta_paths) -> dict:
+    """
+    Apply the delta files in order to `db`, each in its own transaction
+    together with its `applied_deltas` row; files already applied are
+    skipped, so rerunning is safe. Then rebuild the grid index (also with
+    no deltas: snapshots carry no index). Returns file name -> stats.
+    """
+    conn = sqlite3.connect(db)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS applied_deltas (name TEXT PRIMARY KEY, applied_at TEXT NOT NULL)")
+        applied = {r[0] for r in conn.execute("SELECT name FROM applied_deltas")}
+        results = {}
+        for path in delta_paths:
+            name = os.path.basename(path)
+            if name in applied:
+                continue
+            with conn:
+                results[name] = _apply_delta(conn, path)
+                conn.execute(
+                    "INSERT INTO applied_deltas (name, applied_at) VALUES (?, datetime('now'))", (name,)
+                )
+        ensure_grid_index_tables(conn.cursor())
+        with conn:
+            write_grid_index(conn)
+    finally:
+        conn.close()
+    return results
@@ -0,0 +1,142 @@
+"""
+Benchmark der API-Updater gegen den lokalen Mock (mock_api.py), ohne Live-Service.
+
+Startet den Mock, legt eine frische SQLite-DB mit den Mock-Spielern an und
+misst `run_weekly_api_update` (mehrere Läufe hintereinander, ab dem zweiten
+inkrementell) sowie `get_player_stats` und die Aggregation einzeln vs. im
+Batch. Berichtet Wall-Zeit, Requests/s, DB-Schreibzeit, Stage-Zeiten (aus
+`metrics`) und Peak-Speicher.
+
+    python bench_update.py --runs 2 --latency-ms 80 --error-rate 0.01 --rps 20 --json bench_output.json
+"""
+import argparse
+import json
+import os
+import resource
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from mock_api import add_config_args, config_from_args, start_server
+
+
+def _seed_db(path, player_ids):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE players (tm_id INTEGER PRIMARY KEY, name TEXT, "
+        "total_einsaetze INTEGER DEFAULT 0, total_tore INTEGER DEFAULT 0, total_assists INTEGER DEFAULT 0)"
+    )
+    conn.executemany("INSERT INTO players (tm_id, name) VALUES (?, ?)", [(pid, f"Player {pid}") for pid in player_ids])
+    conn.commit()
+    conn.close()
+
+
+def _peak_rss_mb():
+    # Linux reports ru_maxrss in KiB; process-wide high-water mark
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _measure(api, fn):
+    """Run `fn()` and return wall time, request counts, DB write time, stage timers and peak memory."""
+    import metrics
+
+    metrics.reset()
+    requests0, errors0 = api.requests, api.errors
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    status = "ok"
+    try:
+        fn()
+    except Exception as e:
+        status = f"error: {e}"
+    finally:
+        wall = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    requests = api.requests - requests0
+    timers = metrics.report()["timers"]
+    return {
+        "status": status,
+        "wall_s": round(wall, 3),
+        "requests": requests,
+        "server_errors": api.errors - errors0,
+        "requests_per_s": round(requests / wall, 1) if wall else None,
+        "db_write_s": timers.get("db_write", {}).get("seconds", 0.0),
+        "timers_s": {name: t["seconds"] for name, t in timers.items()},
+        "peak_py_heap_mb": round(peak / 2**20, 1),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _best_of(fn, repeat=7):
+    """Fastest of `repeat` timed calls of `fn()`, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+
+def run_benchmark(args):
+    server, api, url = start_server(config_from_args(args))
+    player_ids = api.all_player_ids()
+    report = {"api_base": url, "players": len(player_ids), "config": vars(args), "runs": []}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        _seed_db(db_path, player_ids)
+        # http_client / fetch_engine / metrics / payload_archive read their settings at
+        # import time; DB and payload archive both live in the tempdir, never the real ones
+        os.environ.update(API_BASE=url, DB_PATH=db_path, PAYLOAD_ARCHIVE_DB=os.path.join(tmp, "bench_archive.db"))
+        os.environ.setdefault("RUN_REPORT_PATH", os.path.join(tempfile.gettempdir(), "bench_run_report.json"))
+        if args.rps:
+            os.environ["API_RPS"] = str(args.rps)
+        if args.workers:
+            os.environ["API_WORKERS"] = str(args.workers)
+        import api_stats
+        import weekly_update_api
+        from fetch_engine import API_RPS, TokenBucket, fetch_all
+
+        for i in range(args.runs):
+            if i:
+                api.advance()
+            result = _measure(api, weekly_update_api.run_weekly_api_update)
+            result["run"] = i + 1
+            report["runs"].append(result)
+            print(f"run_weekly_api_update #{i + 1}: {json.dumps(result)}")
+
+        sample = player_ids[:args.sample]
+        limiter = TokenBucket(API_RPS)
+        get_stats = lambda pid: api_stats.get_player_stats(pid, limiter)
+        result = _measure(api, lambda: [r for _, r in fetch_all(sample, get_stats, limiter=limiter)])
+        result["players"] = len(sample)
+        report["get_player_stats"] = result
+        print(f"get_player_stats x{len(sample)}: {json.dumps(result)}")
+
+        payloads = {pid: api.player_stats(pid) for pid in sample}
+        # Warm club-name cache, so both paths time the aggregation only
+        api_stats.resolve_club_names({str(row.get("clubId")) for data in payloads.values() for row in data["stats"]})
+        scalar = _best_of(lambda: [api_stats.aggregate_player_stats(data) for data in payloads.values()])
+        batch = _best_of(lambda: api_stats.aggregate_player_stats_batch(payloads))
+        report["aggregation"] = {"players": len(payloads), "scalar_s": round(scalar, 4), "batch_s": round(batch, 4)}
+        print(f"aggregation x{len(payloads)}: {json.dumps(report['aggregation'])}")
+
+    server.shutdown()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the API updaters against a local mock API")
+    add_config_args(parser)
+    parser.add_argument("--runs", type=int, default=2, help="consecutive update runs (later ones are incremental)")
+    parser.add_argument("--rps", type=float, help="override API_RPS for the updaters")
+    parser.add_argument("--workers", type=int, help="override API_WORKERS for the updaters")
+    parser.add_argument("--sample", type=int, default=200, help="players for the get_player_stats and aggregation benchmarks")
+    parser.add_argument("--json", help="write the full report to this file")
+    args = parser.parse_args()
+    report = run_benchmark(args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
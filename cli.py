@@ -0,0 +1,199 @@
+"""
+Einstiegspunkt für alle Update-Aufgaben.
+
+    python cli.py discover [--backend api|scrape]
+    python cli.py update [--backend api|scrape] [--resume] [--full-refresh] [--roster FILE] [--shard K/N | --shards N]
+    python cli.py merge-shards N
+    python cli.py rebuild
+    python cli.py report [--path run_report.json]
+    python cli.py artifact --base previous.db --snapshot committed.db [--delta-dir deltas]
+    python cli.py apply-delta [--delta-dir deltas | deltas/2026-01-04-020000.jsonl.gz ...]
+
+Die Backends werden erst im jeweiligen Befehl importiert: `report` lädt
+weder requests noch pandas, das API-Backend nie cloudscraper/bs4.
+`--db` setzt DB_PATH, bevor ein Backend geladen wird.
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+
+BACKENDS = ("api", "scrape")
+
+
+def cmd_discover(args):
+    if args.backend == "api":
+        from api_discovery import get_current_swiss_ids_via_api
+        ids = get_current_swiss_ids_via_api()
+    else:
+        from weekly_update import get_current_swiss_ids
+        ids = get_current_swiss_ids()
+    print(f"{len(ids)} Swiss-listed players ({args.backend})")
+    if args.output:
+        from shards import save_roster
+        save_roster(args.output, ids)
+
+
+def cmd_update(args):
+    if args.backend == "scrape":
+        if args.resume or args.full_refresh or args.roster or args.shard or args.shards:
+            sys.exit("--resume/--full-refresh/--roster/--shard/--shards need the api backend")
+        from weekly_update import run_update
+        return run_update()
+    import weekly_update_api
+    if args.shards:
+        if args.roster:
+            sys.exit("--shards discovers the roster itself; --roster is for single runs and shard workers")
+        return weekly_update_api.run_sharded_update(args.shards, full_refresh=args.full_refresh, resume=args.resume)
+    roster = None
+    if args.roster:
+        from shards import load_roster
+        roster = load_roster(args.roster)
+    return weekly_update_api.run_weekly_api_update(
+        full_refresh=args.full_refresh, resume=args.resume, shard=args.shard, roster=roster
+    )
+
+
+def cmd_merge_shards(args):
+    from weekly_update_api import merge_shard_updates
+    merge_shard_updates(args.count)
+
+
+def cmd_rebuild(args):
+    from weekly_update_api import rebuild_from_archive
+    rebuild_from_archive()
+
+
+def cmd_report(args):
+    path = args.path or os.getenv("RUN_REPORT_PATH", "run_report.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            report = json.load(f)
+    except FileNotFoundError:
+        sys.exit(f"No run report at {path}")
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+    print(f"{path}: {report.get('status')} | started {report.get('started_at')} | wall {report.get('wall_s')} s")
+    for key in ("run_id", "shard", "shards", "shards_run", "resumed", "players", "grid_index", "club_cache_hit_ratio"):
+        if key in report:
+            print(f"  {key}: {report[key]}")
+    for name, timer in sorted(report.get("timers", {}).items(), key=lambda kv: -kv[1]["seconds"]):
+        print(f"  timer {name}: {timer['seconds']} s ({timer['calls']} calls)")
+    for name, hist in sorted(report.get("histograms", {}).items()):
+        print(f"  {name}: n={hist['count']} p50={hist['p50']} p95={hist['p95']} max={hist['max']}")
+
+
+def _db_path():
+    from schema import DB_NAME
+    return DB_NAME
+
+
+def _snapshot(db, delta_dir, drop_run_state=False):
+    from artifact import compact_database, pending_deltas
+    before, after = compact_database(db, drop_run_state)
+    for path in pending_deltas(delta_dir):
+        os.remove(path)
+    print(f"New base snapshot {db}: {before / 2**20:.1f} MB -> {after / 2**20:.1f} MB, deltas folded in")
+
+
+def cmd_artifact(args):
+    from artifact import SNAPSHOT_EVERY, export_delta, pending_deltas
+    db = _db_path()
+    if not args.base:
+        return _snapshot(db, args.delta_dir)
+    name = args.name or datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d-%H%M%S")
+    out = os.path.join(args.delta_dir, f"{name}.jsonl.gz")
+    stats = export_delta(args.base, db, out)
+    if not stats["tables"]:
+        os.remove(out)
+        print("No row changes")
+    else:
+        print(f"Delta {out}: {stats['tables']} tables, +{stats['inserted']} / -{stats['deleted']} rows, "
+              f"{os.path.getsize(out) / 1024:.1f} KB")
+        if len(pending_deltas(args.delta_dir)) >= (args.snapshot_every or SNAPSHOT_EVERY):
+            # The CI runner's run journal and retry queue are not worth shipping
+            return _snapshot(db, args.delta_dir, drop_run_state=True)
+    if args.snapshot:
+        # Between snapshots the committed DB keeps its bytes, so git sees no change
+        shutil.copyfile(args.snapshot, db)
+        print(f"{db} restored to the base snapshot ({len(pending_deltas(args.delta_dir))} deltas pending)")
+
+
+def cmd_apply_delta(args):
+    from artifact import apply_deltas, pending_deltas
+    db = _db_path()
+    results = apply_deltas(db, args.deltas or pending_deltas(args.delta_dir))
+    for name, stats in results.items():
+        print(f"Applied {name}: +{stats['inserted']} / -{stats['deleted']} rows")
+    print(f"{db}: {len(results)} deltas applied, grid index rebuilt")
+
+
+def _shard_spec(value):
+    # Imported here so argument parsing stays cheap for the other commands
+    from shards import parse_shard_spec
+    try:
+        return parse_shard_spec(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Swiss football grid data updates")
+    parser.add_argument("--db", help="SQLite database (default: DB_PATH or schweizer_fussball_grid.db)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("discover", help="list the players currently registered in C1/C2")
+    p.add_argument("--backend", choices=BACKENDS, default="api")
+    p.add_argument("--output", help="write the ids to this file, one per line")
+    p.set_defaults(func=cmd_discover)
+
+    p = sub.add_parser("update", help="weekly player update")
+    p.add_argument("--backend", choices=BACKENDS, default="api")
+    p.add_argument("--resume", action="store_true", help="continue the latest interrupted run")
+    p.add_argument("--full-refresh", action="store_true", help="ignore stored payload fingerprints")
+    p.add_argument("--roster", help="take the roster from this file (`discover --output`) instead of discovering it")
+    shard = p.add_mutually_exclusive_group()
+    shard.add_argument("--shard", type=_shard_spec, metavar="K/N", help="update only shard K of N into its own shard DB")
+    shard.add_argument("--shards", type=int, metavar="N", help="run N local shard workers, then merge")
+    p.set_defaults(func=cmd_update)
+
+    p = sub.add_parser("merge-shards", help="merge the finished shard DBs 1..N into the main DB")
+    p.add_argument("count", type=int, metavar="N")
+    p.set_defaults(func=cmd_merge_shards)
+
+    p = sub.add_parser("rebuild", help="rebuild all derived tables from the payload archive, offline")
+    p.set_defaults(func=cmd_rebuild)
+
+    p = sub.add_parser("artifact", help="write the row delta against --base; a new base snapshot every N deltas")
+    p.add_argument("--base", help="database before the update (delta source); without it, write a snapshot now")
+    p.add_argument("--snapshot", help="committed base snapshot, restored while no new snapshot is due")
+    p.add_argument("--delta-dir", default="deltas")
+    p.add_argument("--name", help="delta file name without extension (default: UTC timestamp)")
+    p.add_argument("--snapshot-every", type=int, metavar="N",
+                   help="write a new snapshot once N deltas are pending (default: SNAPSHOT_EVERY or 8)")
+    p.set_defaults(func=cmd_artifact)
+
+    p = sub.add_parser("apply-delta", help="apply pending deltas to the base snapshot and rebuild the grid index")
+    p.add_argument("deltas", nargs="*", help="delta files in order (default: all in --delta-dir)")
+    p.add_argument("--delta-dir", default="deltas")
+    p.set_defaults(func=cmd_apply_delta)
+
+    p = sub.add_parser("report", help="summarise the last run report")
+    p.add_argument("--path", help="report file (default: RUN_REPORT_PATH or run_report.json)")
+    p.add_argument("--json", action="store_true", help="print the raw report")
+    p.set_defaults(func=cmd_report)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.db:
+        os.environ["DB_PATH"] = args.db
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Gebündeltes Schreiben der Spieler-Snapshots in SQLite.
+
+Statt pro Spieler Dutzende einzelne `execute`-Aufrufe mit eigenem Commit zu
+machen, sammelt der Writer die Zeilen pro Statement und schreibt sie mit
+`executemany` in einer Transaktion pro Batch. Die Verbindung läuft im
+WAL-Modus, damit die Leser in server.js während des Updates nicht blockieren.
+Snapshots und Kader-Flags werden als Mengen-Diff geschrieben: nur Zeilen,
+die sich wirklich ändern, landen im WAL.
+"""
+import json
+import os
+import sqlite3
+
+import metrics
+
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "200"))
+DB_CACHE_KB = int(os.getenv("DB_CACHE_KB", "65536"))
+
+
+def connect(db_name: str) -> sqlite3.Connection:
+    """Open `db_name` in WAL mode with write-friendly synchronous/cache pragmas."""
+    conn = sqlite3.connect(db_name)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def close(conn: sqlite3.Connection):
+    """Fold the WAL back into the main file so the .db is self-contained, then close."""
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+class BatchWriter:
+    """
+    Buffers write statements and flushes them with `executemany`.
+
+    Rows are grouped per SQL statement; statements run in the order they were
+    first added, so a player's DELETE still precedes its re-INSERT (each player
+    is expected at most once per batch). Call `end_player()` after each player
+    and `flush()` once at the end.
+    `on_flush(conn)` runs inside every flush transaction.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, batch_size: int = DB_BATCH_SIZE, on_flush=None):
+        self.conn = conn
+        self.batch_size = max(1, batch_size)
+        self.on_flush = on_flush
+        self._rows = {}
+        self._players = 0
+
+    def add(self, sql: str, params: tuple):
+        self._rows.setdefault(sql, []).append(params)
+
+    def add_many(self, sql: str, rows):
+        rows = list(rows)
+        if rows:
+            self._rows.setdefault(sql, []).extend(rows)
+
+    def end_player(self):
+        self._players += 1
+        if self._players >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write everything buffered in one transaction. Returns the number of rows."""
+        pending, self._rows, self._players = self._rows, {}, 0
+        if not pending:
+            return 0
+        with metrics.timed("db_write"), self.conn:
+            for sql, rows in pending.items():
+                self.conn.executemany(sql, rows)
+            if self.on_flush:
+                self.on_flush(self.conn)
+        written = sum(len(rows) for rows in pending.values())
+        metrics.incr("db.rows_written", written)
+        return written
+
+
+def write_snapshot(writer: BatchWriter, table: str, key_col: str, value_col: str, tid: int, values: dict):
+    """
+    Queue statements that make `table`'s rows of player `tid` equal to
+    `values` (key -> value): keys no longer present are deleted, rows are
+    only rewritten when their value differs.
+    """
+    writer.add(
+        f"DELETE FROM {table} WHERE tm_id = ? AND {key_col} NOT IN (SELECT value FROM json_each(?))",
+        (tid, json.dumps(list(values), ensure_ascii=False))
+    )
+    writer.add_many(
+        f"INSERT INTO {table} (tm_id, {key_col}, {value_col}) VALUES (?, ?, ?) "
+        f"ON CONFLICT(tm_id, {key_col}) DO UPDATE SET {value_col}=excluded.{value_col} "
+        f"WHERE {value_col} IS NOT excluded.{value_col}",
+        [(tid, key, value) for key, value in values.items()]
+    )
+
+
+def write_key_set(writer: BatchWriter, table: str, key_col: str, tid: int, keys):
+    """Like `write_snapshot` for key-only tables without a primary key (e.g. player_leagues)."""
+    keys = list(dict.fromkeys(keys))
+    writer.add(
+        f"DELETE FROM {table} WHERE tm_id = ? AND {key_col} NOT IN (SELECT value FROM json_each(?))",
+        (tid, json.dumps(keys, ensure_ascii=False))
+    )
+    writer.add_many(
+        f"INSERT INTO {table} (tm_id, {key_col}) SELECT ?, ? "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE tm_id = ? AND {key_col} = ?)",
+        [(tid, key, tid, key) for key in keys]
+    )
+
+
+def apply_roster_flags(conn: sqlite3.Connection, tm_ids, column: str = "in_switzerland") -> tuple:
+    """
+    Set players.`column` to 1 exactly for `tm_ids` and to 0 for everyone
+    else, via a temp table and two set-based UPDATEs that only touch rows
+    whose flag changes. Returns (flagged, cleared) row counts.
+    """
+    with metrics.timed("db_write"), conn:
+        return set_roster_flags(conn, tm_ids, column)
+
+
+def set_roster_flags(conn: sqlite3.Connection, tm_ids, column: str = "in_switzerland") -> tuple:
+    """`apply_roster_flags` inside the caller's open transaction."""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS roster_ids (tm_id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.roster_ids")
+    conn.executemany("INSERT OR IGNORE INTO temp.roster_ids (tm_id) VALUES (?)", [(tid,) for tid in tm_ids])
+    cleared = conn.execute(
+        f"UPDATE players SET {column} = 0 "
+        f"WHERE {column} IS NOT 0 AND tm_id NOT IN (SELECT tm_id FROM temp.roster_ids)"
+    ).rowcount
+    flagged = conn.execute(
+        f"UPDATE players SET {column} = 1 "
+        f"WHERE {column} IS NOT 1 AND tm_id IN (SELECT tm_id FROM temp.roster_ids)"
+    ).rowcount
+    conn.execute("DELETE FROM temp.roster_ids")
+    metrics.incr("db.roster_flags_changed", flagged + cleared)
+    return flagged, cleared
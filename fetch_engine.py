@@ -0,0 +1,148 @@
+"""
+Nebenläufiges, rate-limitiertes Abrufen für die API-Updates.
+
+Worker-Threads holen die Daten, ein gemeinsamer Token-Bucket hält das
+Requests-pro-Sekunde-Budget ein. Ergebnisse werden an den aufrufenden Thread
+zurückgegeben, der als einziger in SQLite schreibt. Stufen lassen sich
+verketten: die Eingabe darf selbst ein laufender Stream sein (z.B.
+Kader-Discovery -> Stats). Die Eingabe wird nur so schnell gelesen, wie
+Plätze im Pool frei werden; `prioritized` ordnet einen solchen Stream um,
+damit jeweils das dringendste bereits bekannte Element als nächstes startet.
+"""
+import heapq
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+API_WORKERS = int(os.getenv("API_WORKERS", "8"))
+API_RPS = float(os.getenv("API_RPS", "4"))
+
+_FEED_DONE = object()
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def fetch_all(items, fetch_fn, workers: int = API_WORKERS, rate: float = API_RPS, limiter: TokenBucket | None = None,
+              max_pending: int | None = None):
+    """
+    Run `fetch_fn(item)` for every item on a bounded thread pool and yield
+    `(item, result)` pairs in completion order. Each call first takes a token
+    from `limiter` (or a fresh bucket at `rate` req/s). Exceptions from
+    `fetch_fn` are yielded as the result so one bad item does not stop the run.
+
+    `items` may be a lazy iterable (e.g. another `fetch_all` stage): it is
+    drained on a feeder thread, so results are yielded while it is still
+    producing. At most `max_pending` (default 2 x workers) items are
+    submitted but unfinished, so a lazy input is only pulled as the pool
+    frees up. An exception raised by `items` itself is re-raised at the end.
+    """
+    limiter = limiter or TokenBucket(rate)
+    done = queue.Queue()
+    feed_error = []
+    slots = threading.BoundedSemaphore(max_pending or 2 * max(1, workers))
+
+    def _finished(item, fut):
+        slots.release()
+        done.put((item, fut))
+
+    def _run(item):
+        with metrics.timed("rate_limit_wait"):
+            limiter.acquire()
+        return fetch_fn(item)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        def _feed():
+            submitted = 0
+            try:
+                for item in items:
+                    slots.acquire()
+                    fut = pool.submit(_run, item)
+                    fut.add_done_callback(lambda f, item=item: _finished(item, f))
+                    submitted += 1
+            except Exception as e:
+                feed_error.append(e)
+            finally:
+                done.put((_FEED_DONE, submitted))
+
+        threading.Thread(target=_feed, name="fetch-feeder", daemon=True).start()
+
+        submitted = None
+        received = 0
+        while submitted is None or received < submitted:
+            item, fut = done.get()
+            if item is _FEED_DONE:
+                submitted = fut
+                continue
+            received += 1
+            try:
+                yield item, fut.result()
+            except Exception as e:
+                yield item, e
+
+    if feed_error:
+        raise feed_error[0]
+
+
+def prioritized(items, key):
+    """
+    Re-yield the (lazy) iterable `items` smallest `key(item)` first among the
+    items produced so far. `items` is drained on its own thread; fed into
+    `fetch_all`, whose intake is bounded, the pool always starts the most
+    urgent item known at that moment. Exceptions from `items` are re-raised
+    once everything produced has been yielded.
+    """
+    heap = []
+    ready = threading.Condition()
+    finished = []
+
+    def _drain():
+        try:
+            for seq, item in enumerate(items):
+                with ready:
+                    heapq.heappush(heap, (key(item), seq, item))
+                    ready.notify()
+        except Exception as e:
+            finished.append(e)
+        finally:
+            with ready:
+                finished.append(None)
+                ready.notify()
+
+    threading.Thread(target=_drain, name="priority-feeder", daemon=True).start()
+    while True:
+        with ready:
+            while not heap and not finished:
+                ready.wait()
+            if not heap:
+                break
+            item = heapq.heappop(heap)[2]
+        yield item
+    if finished[0] is not None:
+        raise finished[0]
@@ -0,0 +1,243 @@
+"""
+Vorberechnete Lookup-Tabellen für die Grid-Prüfung in server.js.
+
+Letzte Stufe der Updates: löst die Grid-Schlüssel (CLUB_MAP / LEAGUE_MAP aus
+server.js) einmal in konkrete club_name/league_code-Werte auf und
+materialisiert pro Kategorie (Club, Liga, Schwellenwerte) die passenden
+tm_ids. server.js prüft dann mit indexierten Punktabfragen statt mit
+LIKE '%…%'-Scans. Zusätzlich wird pro (Kategorie, Schlüssel) ein gepacktes
+Bitset über dichte Spieler-Ordinalzahlen exportiert, damit eine Grid-Zelle
+(Zeile × Spalte) ein einziges exaktes bitweises AND ist. Alles wird in einer
+Transaktion neu aufgebaut; Leser sehen (WAL) bis zum Commit den alten Stand.
+"""
+import datetime
+
+import numpy as np
+
+# Keep in sync with CLUB_MAP / LEAGUE_MAP in server.js
+CLUB_MAP = {
+    "Basel": "FC Basel 1893", "Thun": "FC Thun", "St. Gallen": "FC St. Gallen 1879",
+    "Lugano": "FC Lugano", "Sion": "FC Sion", "Young Boys": "Young Boys",
+    "Luzern": "FC Luzern", "Grasshopper": "Grasshopper Club Zürich",
+    "Zürich": "FC Zürich", "Winterthur": "FC Winterthur", "Lausanne": "Lausanne-Sport",
+    "Servette": "Servette FC", "Aarau": "FC Aarau", "Vaduz": "FC Vaduz",
+    "Xamax": "Neuchâtel Xamax", "Wil": "FC Wil 1900",
+}
+LEAGUE_MAP = {
+    "Germany": "Bundesliga", "England": "Premier League",
+    "France": "Ligue 1", "Spain": "La Liga", "Italy": "Serie A",
+}
+NATION_MAP = {
+    "SUI": "Switzerland", "ALB": "Albania", "GER": "Germany", "FRA": "France",
+    "ITA": "Italy", "SRB": "Serbia", "KOS": "Kosovo", "AUT": "Austria", "ESP": "Spain", "BRA": "Brazil",
+    "ARG": "Argentina", "CMR": "Cameroon", "CIV": "Cote d'Ivoire", "POR": "Portugal", "TUR": "Türkiye",
+    "CRO": "Croatia", "BIH": "Bosnia-Herzegovina",
+}
+
+# Tables whose club_name values the club keys are resolved against
+CLUB_NAME_TABLES = (
+    "player_clubs", "player_club_goals", "player_club_assists", "player_club_appearances",
+    "player_club_yellow_cards", "player_club_red_cards", "player_club_last_season",
+    "player_club_season_goals", "player_club_season_assists",
+)
+
+# (category, source table, condition): keyed by club, same thresholds as server.js
+CLUB_CATEGORIES = (
+    ("team", "player_clubs", "1"),
+    ("red_card_club_1", "player_club_red_cards", "s.red_cards >= 1"),
+    ("yellow_cards_club_20", "player_club_yellow_cards", "s.yellow_cards > 20"),
+    ("goals_club_50", "player_club_goals", "s.goals >= 25"),
+    ("assists_club_50", "player_club_assists", "s.assists >= 15"),
+    ("goals_season_10_club", "player_club_season_goals", "s.goals >= 10"),
+)
+
+# (category, source table, condition): not keyed (key = '')
+GLOBAL_CATEGORIES = (
+    ("goals_season_10", "player_season_goals", "goals >= 10"),
+    ("assists_season_10", "player_season_assists", "assists >= 10"),
+    ("champions_league", "player_leagues", "league_code = 'UEFA Champions League'"),
+)
+
+# (category, players column, condition): not keyed, built when the column exists
+PLAYER_FLAG_CATEGORIES = (
+    ("champion", "meistertitel", "meistertitel > 0"),
+    ("cupwinner", "is_cupwinner", "is_cupwinner = 1"),
+    ("world_cup", "is_world_cup", "is_world_cup = 1"),
+    ("euro", "is_euro", "is_euro = 1"),
+    ("national_team_appearances", "national_team_appearances", "national_team_appearances > 0"),
+)
+
+
+# Everything build_grid_index writes (derived, rebuilt from scratch each time)
+GRID_INDEX_TABLES = (
+    "club_key_names", "league_key_names", "grid_category_players", "grid_index_parts",
+    "grid_player_ordinals", "grid_category_bitsets",
+)
+
+
+def ensure_grid_index_tables(cur):
+    for sql in [
+        "CREATE TABLE IF NOT EXISTS club_key_names (club_key TEXT NOT NULL, club_name TEXT NOT NULL, PRIMARY KEY(club_key, club_name))",
+        "CREATE INDEX IF NOT EXISTS idx_club_key_names_name ON club_key_names (club_name)",
+        "CREATE TABLE IF NOT EXISTS league_key_names (league_key TEXT NOT NULL, league_code TEXT NOT NULL, PRIMARY KEY(league_key, league_code))",
+        "CREATE INDEX IF NOT EXISTS idx_league_key_names_code ON league_key_names (league_code)",
+        "CREATE TABLE IF NOT EXISTS grid_category_players (category TEXT NOT NULL, key TEXT NOT NULL, tm_id INTEGER NOT NULL, PRIMARY KEY(category, key, tm_id))",
+        "CREATE INDEX IF NOT EXISTS idx_grid_category_players_tm ON grid_category_players (tm_id, category, key)",
+        "CREATE TABLE IF NOT EXISTS grid_index_parts (part TEXT PRIMARY KEY, rows INTEGER NOT NULL, built_at TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS grid_player_ordinals (ordinal INTEGER PRIMARY KEY, tm_id INTEGER NOT NULL UNIQUE)",
+        "CREATE TABLE IF NOT EXISTS grid_category_bitsets (category TEXT NOT NULL, key TEXT NOT NULL, cardinality INTEGER NOT NULL, bits BLOB NOT NULL, PRIMARY KEY(category, key))",
+    ]:
+        cur.execute(sql)
+
+
+def league_search_terms(value: str, label: str) -> list:
+    """Python port of getLeagueSearchTerms in server.js."""
+    terms = []
+    for t in (value, LEAGUE_MAP.get(value), label, LEAGUE_MAP.get(label)):
+        if t and t not in terms:
+            terms.append(t)
+    expanded = []
+    for t in terms:
+        for variant in (t, "".join(t.split())):
+            if variant not in expanded:
+                expanded.append(variant)
+    return expanded
+
+
+def _existing_tables(cur) -> set:
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    return {r[0] for r in cur.fetchall()}
+
+
+def _build_bitsets(conn) -> int:
+    """
+    Number every player in grid_category_players densely by tm_id
+    (grid_player_ordinals) and store one packed bitset per (category, key):
+    bit `o` (byte o // 8, bit o % 8, little-endian) is set when the player
+    with ordinal `o` qualifies. Returns the number of bitsets.
+    """
+    conn.execute(
+        "INSERT INTO grid_player_ordinals (ordinal, tm_id) "
+        "SELECT ROW_NUMBER() OVER (ORDER BY tm_id) - 1, tm_id FROM (SELECT DISTINCT tm_id FROM grid_category_players)"
+    )
+    rows = conn.execute(
+        "SELECT g.category, g.key, o.ordinal FROM grid_category_players g "
+        "JOIN grid_player_ordinals o ON o.tm_id = g.tm_id ORDER BY g.category, g.key"
+    ).fetchall()
+    if not rows:
+        return 0
+    size = conn.execute("SELECT COUNT(*) FROM grid_player_ordinals").fetchone()[0]
+    categories = [(r[0], r[1]) for r in rows]
+    ordinals = np.fromiter((r[2] for r in rows), dtype=np.int64, count=len(rows))
+    # rows are sorted, so each (category, key) is one contiguous run
+    starts = [i for i in range(len(categories)) if i == 0 or categories[i] != categories[i - 1]]
+    bitsets = []
+    for start, end in zip(starts, starts[1:] + [len(categories)]):
+        members = np.zeros(size, dtype=bool)
+        members[ordinals[start:end]] = True
+        bitsets.append((*categories[start], end - start, np.packbits(members, bitorder="little").tobytes()))
+    conn.executemany(
+        "INSERT INTO grid_category_bitsets (category, key, cardinality, bits) VALUES (?, ?, ?, ?)",
+        bitsets
+    )
+    return len(bitsets)
+
+
+def build_grid_index(conn) -> dict:
+    """
+    Rebuild club/league key tables, grid_category_players and the category
+    bitsets in one transaction. Categories whose source table or column does
+    not exist are skipped and not listed in grid_index_parts, so server.js
+    keeps its fallback queries for them. Returns part -> row count.
+    """
+    ensure_grid_index_tables(conn.cursor())
+    with conn:
+        return write_grid_index(conn)
+
+
+def write_grid_index(conn) -> dict:
+    """`build_grid_index` inside the caller's open transaction (tables must exist)."""
+    tables = _existing_tables(conn.cursor())
+    parts = {}
+
+    def _count(sql, params=()):
+        return conn.execute(sql, params).rowcount
+
+    for table in GRID_INDEX_TABLES:
+        conn.execute(f"DELETE FROM {table}")
+
+    # LIKE here on purpose: same matching as the server's fallback queries, done once per build
+    club_sources = [t for t in CLUB_NAME_TABLES if t in tables]
+    if club_sources:
+        names = " UNION ".join(f"SELECT club_name FROM {t}" for t in club_sources)
+        parts["club_keys"] = sum(
+            _count(
+                f"INSERT INTO club_key_names (club_key, club_name) "
+                f"SELECT ?, club_name FROM ({names}) WHERE club_name LIKE ? OR club_name LIKE ?",
+                (key, f"%{full}%", f"%{key}%")
+            )
+            for key, full in CLUB_MAP.items()
+        )
+
+    if "player_leagues" in tables:
+        rows = 0
+        for key, label in LEAGUE_MAP.items():
+            terms = league_search_terms(key, label)
+            where = " OR ".join("league_code LIKE ?" for _ in terms)
+            rows += _count(
+                f"INSERT INTO league_key_names (league_key, league_code) "
+                f"SELECT DISTINCT ?, league_code FROM player_leagues WHERE {where}",
+                (key, *[f"%{t}%" for t in terms])
+            )
+        parts["league_keys"] = rows
+        parts["league"] = _count(
+            "INSERT OR IGNORE INTO grid_category_players (category, key, tm_id) "
+            "SELECT 'league', k.league_key, s.tm_id FROM player_leagues s "
+            "JOIN league_key_names k ON k.league_code = s.league_code"
+        )
+
+    if "club_keys" in parts:
+        for category, table, condition in CLUB_CATEGORIES:
+            if table in tables:
+                parts[category] = _count(
+                    f"INSERT OR IGNORE INTO grid_category_players (category, key, tm_id) "
+                    f"SELECT ?, k.club_key, s.tm_id FROM {table} s "
+                    f"JOIN club_key_names k ON k.club_name = s.club_name WHERE {condition}",
+                    (category,)
+                )
+
+    for category, table, condition in GLOBAL_CATEGORIES:
+        if table in tables:
+            parts[category] = _count(
+                f"INSERT OR IGNORE INTO grid_category_players (category, key, tm_id) "
+                f"SELECT DISTINCT ?, '', tm_id FROM {table} WHERE {condition}",
+                (category,)
+            )
+
+    if "player_nations" in tables:
+        parts["nation"] = sum(
+            _count(
+                "INSERT OR IGNORE INTO grid_category_players (category, key, tm_id) "
+                "SELECT DISTINCT 'nation', ?, tm_id FROM player_nations WHERE nation_code = ?",
+                (key, code)
+            )
+            for key, code in NATION_MAP.items()
+        )
+
+    player_cols = {r[1] for r in conn.execute("PRAGMA table_info(players)")}
+    for category, column, condition in PLAYER_FLAG_CATEGORIES:
+        if column in player_cols:
+            parts[category] = _count(
+                f"INSERT OR IGNORE INTO grid_category_players (category, key, tm_id) "
+                f"SELECT ?, '', tm_id FROM players WHERE {condition}",
+                (category,)
+            )
+
+    parts["bitsets"] = _build_bitsets(conn)
+
+    built_at = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    conn.executemany(
+        "INSERT INTO grid_index_parts (part, rows, built_at) VALUES (?, ?, ?)",
+        [(part, rows, built_at) for part, rows in parts.items()]
+    )
+    return parts
@@ -0,0 +1,95 @@
+"""
+Gemeinsame HTTP-Schicht für die Transfermarkt-API.
+
+Eine Keep-Alive-Session mit Connection-Pool für alle Aufrufe, Timeouts pro
+Endpoint und exponentielles Backoff bei transienten Fehlern (inkl. 429 mit
+Retry-After).
+"""
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+
+API_BASE = os.getenv("API_BASE", "http://localhost:8000")
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "4"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+
+# (connect, read) timeouts per endpoint kind
+TIMEOUTS = {
+    "docs": (5, 15),
+    "competition_clubs": (5, 25),
+    "club_players": (5, 25),
+    "club_profile": (5, 15),
+    "player_stats": (5, 20),
+}
+DEFAULT_TIMEOUT = (5, 20)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=HTTP_RETRIES,
+        status=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry, pool_block=True)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept": "application/json"})
+    return session
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def _record(endpoint: str, t0: float, resp: requests.Response | None):
+    metrics.incr(f"http.{endpoint}.requests")
+    metrics.observe(f"http.{endpoint}.latency_ms", (time.perf_counter() - t0) * 1000)
+    if resp is None:
+        metrics.incr(f"http.{endpoint}.exceptions")
+        return
+    retries = getattr(resp.raw, "retries", None)
+    if retries is not None and retries.history:
+        metrics.incr(f"http.{endpoint}.retries", len(retries.history))
+    if resp.status_code >= 400 or resp.status_code == 304:
+        metrics.incr(f"http.{endpoint}.status_{resp.status_code}")
+
+
+def api_get(path: str, endpoint: str, **kwargs) -> requests.Response:
+    """
+    GET `API_BASE + path` on the shared session with the endpoint's timeout.
+    Latency (including retries), retry count and error statuses are recorded
+    in `metrics` under `http.<endpoint>.*`.
+    """
+    kwargs.setdefault("timeout", TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT))
+    t0 = time.perf_counter()
+    resp = None
+    try:
+        resp = get_session().get(f"{API_BASE}{path}", **kwargs)
+        return resp
+    finally:
+        _record(endpoint, t0, resp)
@@ -0,0 +1,123 @@
+"""
+Laufzeit-Metriken für die Update-Läufe (Latenzen, Zähler, Stage-Zeiten).
+
+Prozessweites, thread-sicheres Register: `incr` für Zähler, `observe` für
+Histogramme (z.B. Latenz pro Endpoint), `timed` für aufsummierte Zeit pro
+Stage. `write_report` schreibt am Ende eines Laufs alles als JSON.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+RUN_REPORT_PATH = os.getenv("RUN_REPORT_PATH", "run_report.json")
+
+# Upper bucket bounds in milliseconds for latency histograms
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_timers = {}
+_info = {}
+_started = time.time()
+
+
+def reset():
+    global _started
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _timers.clear()
+        _info.clear()
+        _started = time.time()
+
+
+def incr(name: str, n: float = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def set_info(key: str, value):
+    """Attach a plain value (run id, roster size, ...) to the report."""
+    with _lock:
+        _info[key] = value
+
+
+def observe(name: str, value: float):
+    """Record one sample (milliseconds for latencies) in histogram `name`."""
+    with _lock:
+        _histograms.setdefault(name, []).append(value)
+
+
+def add_time(name: str, seconds: float):
+    with _lock:
+        total, calls = _timers.get(name, (0.0, 0))
+        _timers[name] = (total + seconds, calls + 1)
+
+
+@contextmanager
+def timed(name: str):
+    """Add the wall time of the block to timer `name` (summed across threads and calls)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - t0)
+
+
+def _quantile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _summarise(samples):
+    ordered = sorted(samples)
+    buckets = {}
+    for bound in LATENCY_BUCKETS_MS:
+        buckets["+inf" if bound == float("inf") else f"le_{bound}"] = 0
+    for value in ordered:
+        for bound in LATENCY_BUCKETS_MS:
+            if value <= bound:
+                buckets["+inf" if bound == float("inf") else f"le_{bound}"] += 1
+                break
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "p50": round(_quantile(ordered, 0.50), 2),
+        "p95": round(_quantile(ordered, 0.95), 2),
+        "max": round(ordered[-1], 2),
+        "buckets": buckets,
+    }
+
+
+def ratio(hits: str, misses: str):
+    """hits / (hits + misses) over two counters, None when both are zero."""
+    with _lock:
+        h, m = _counters.get(hits, 0), _counters.get(misses, 0)
+    return round(h / (h + m), 4) if h + m else None
+
+
+def report(**extra) -> dict:
+    with _lock:
+        counters = dict(_counters)
+        histograms = {name: _summarise(samples) for name, samples in _histograms.items() if samples}
+        timers = {name: {"seconds": round(total, 3), "calls": calls} for name, (total, calls) in _timers.items()}
+        info = dict(_info)
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(_started)),
+        "wall_s": round(time.time() - _started, 3),
+        **info,
+        "counters": counters,
+        "histograms": histograms,
+        "timers": timers,
+        **extra,
+    }
+
+
+def write_report(path: str | None = None, **extra) -> dict:
+    """Write `report(**extra)` as JSON to `path` (default RUN_REPORT_PATH) and return it."""
+    data = report(**extra)
+    with open(path or RUN_REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    return data
@@ -0,0 +1,194 @@
+"""
+Lokaler Stand-in für die Transfermarkt-API (für Benchmarks ohne Live-Service).
+
+Bedient /docs, /competitions/{id}/clubs, /clubs/{id}/players,
+/clubs/{id}/profile und /players/{id}/stats mit deterministischen Daten.
+Latenz, Fehlerquoten (500/429) und Kadergrössen sind konfigurierbar;
+/players/{id}/stats liefert ETags und beantwortet If-None-Match mit 304.
+
+    python mock_api.py --port 8000 --latency-ms 80 --error-rate 0.02
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPETITIONS = ("C1", "C2")
+
+
+class MockConfig:
+    def __init__(self, clubs_per_competition=10, players_per_club=25, stats_rows=40, club_pool=300,
+                 latency_ms=50.0, jitter_ms=20.0, error_rate=0.0, throttle_rate=0.0, churn=0.1, seed=1):
+        self.clubs_per_competition = clubs_per_competition
+        self.players_per_club = players_per_club
+        self.stats_rows = stats_rows
+        self.club_pool = club_pool
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.churn = churn
+        self.seed = seed
+
+
+class MockTransfermarkt:
+    """Data model plus request counters; `advance()` lets a `churn` share of players change."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.generation = 0
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(config.seed)
+
+    def competition_club_ids(self, comp_id):
+        if comp_id not in COMPETITIONS:
+            return None
+        offset = COMPETITIONS.index(comp_id) * self.config.clubs_per_competition
+        return [1000 + offset + i for i in range(self.config.clubs_per_competition)]
+
+    def club_player_ids(self, club_id):
+        index = club_id - 1000
+        if not 0 <= index < len(COMPETITIONS) * self.config.clubs_per_competition:
+            return None
+        base = 100000 + index * self.config.players_per_club
+        return list(range(base, base + self.config.players_per_club))
+
+    def all_player_ids(self):
+        return [pid for comp in COMPETITIONS for club in self.competition_club_ids(comp) for pid in self.club_player_ids(club)]
+
+    def player_stats(self, pid):
+        rng = random.Random(f"{self.config.seed}:{pid}")
+        # Players selected by churn get one extra goal per generation
+        bumps = sum(1 for gen in range(1, self.generation + 1)
+                    if random.Random(f"{self.config.seed}:{pid}:{gen}").random() < self.config.churn)
+        rows = []
+        for i in range(self.config.stats_rows):
+            rows.append({
+                "competitionId": rng.choice(["C1", "C2", "GB1", "L1", "CL"]),
+                "competitionName": rng.choice(["Super League", "Challenge League", "Premier League", "Bundesliga", "Champions League"]),
+                "seasonId": str(rng.randint(2005, 2025)),
+                "clubId": str(1000 + rng.randrange(self.config.club_pool)),
+                "appearances": str(rng.randint(0, 38)),
+                "goals": str(rng.randint(0, 20) + (bumps if i == 0 else 0)),
+                "assists": rng.choice(["-", str(rng.randint(0, 12))]),
+                "yellowCards": str(rng.randint(0, 8)),
+                "secondYellowCards": rng.choice(["-", "1"]),
+                "redCards": rng.choice(["-", "1"]),
+            })
+        return {"id": str(pid), "stats": rows}
+
+    def advance(self):
+        self.generation += 1
+
+    def count(self, error=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+
+    def roll(self):
+        with self._lock:
+            return self._rng.random()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    api: MockTransfermarkt = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        api, cfg = self.api, self.api.config
+        time.sleep(max(0.0, cfg.latency_ms + api.roll() * 2 * cfg.jitter_ms - cfg.jitter_ms) / 1000)
+
+        roll = api.roll()
+        if roll < cfg.throttle_rate:
+            api.count(error=True)
+            return self._send(429, {"detail": "Too Many Requests"}, {"Retry-After": "0"})
+        if roll < cfg.throttle_rate + cfg.error_rate:
+            api.count(error=True)
+            return self._send(500, {"detail": "Internal Server Error"})
+        api.count()
+
+        path = self.path.split("?", 1)[0]
+        if path == "/docs":
+            return self._send(200, {"docs": True})
+        if m := re.fullmatch(r"/competitions/(\w+)/clubs", path):
+            ids = api.competition_club_ids(m.group(1))
+            if ids is None:
+                return self._send(404, {"detail": "Not Found"})
+            return self._send(200, {"id": m.group(1), "clubs": [{"id": str(i), "name": f"Club {i}"} for i in ids]})
+        if m := re.fullmatch(r"/clubs/(\d+)/players", path):
+            ids = api.club_player_ids(int(m.group(1)))
+            if ids is None:
+                return self._send(404, {"detail": "Not Found"})
+            return self._send(200, {"id": m.group(1), "players": [{"id": str(i), "name": f"Player {i}"} for i in ids]})
+        if m := re.fullmatch(r"/clubs/(\d+)/profile", path):
+            return self._send(200, {"id": m.group(1), "name": f"Club {m.group(1)}"})
+        if m := re.fullmatch(r"/players/(\d+)/stats", path):
+            body = api.player_stats(int(m.group(1)))
+            etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, headers={"ETag": etag})
+            return self._send(200, body, {"ETag": etag})
+        return self._send(404, {"detail": "Not Found"})
+
+
+def start_server(config: MockConfig, host="127.0.0.1", port=0):
+    """Serve `config` on a background thread. Returns (server, api, base_url)."""
+    api = MockTransfermarkt(config)
+    handler = type("Handler", (_Handler,), {"api": api})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-api", daemon=True).start()
+    return server, api, f"http://{host}:{server.server_address[1]}"
+
+
+def add_config_args(parser):
+    parser.add_argument("--clubs", type=int, default=10, help="clubs per competition")
+    parser.add_argument("--players", type=int, default=25, help="players per club")
+    parser.add_argument("--stats-rows", type=int, default=40, help="stats rows per player")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--churn", type=float, default=0.1, help="share of players changing per run")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(
+        clubs_per_competition=args.clubs, players_per_club=args.players, stats_rows=args.stats_rows,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, churn=args.churn, seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Transfermarkt API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_config_args(parser)
+    args = parser.parse_args()
+    server, _, url = start_server(config_from_args(args), args.host, args.port)
+    print(f"Mock Transfermarkt API on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,108 @@
+"""
+Append-only Archiv der rohen API-Antworten (Spieler-Stats, Club-Profile).
+
+Jede geänderte /players/{id}/stats-Antwort, die erste Antwort für einen noch
+nicht archivierten Spieler und jedes /clubs/{id}/profile wird zlib-komprimiert
+als JSON-Blob in einer eigenen SQLite-Datei abgelegt, Schlüssel (kind, key,
+fetched_at). Die Datei wird als Schema `archive` an die Update-Verbindung
+gehängt; die Archiv-Zeilen laufen über denselben BatchWriter-Flush wie die
+Spielerdaten. Atomar über beide Dateien ist das im WAL-Modus nicht: nach
+einem Abbruch kann ein Archiv-Eintrag fehlen, der nächste Lauf holt ihn nach.
+`cli.py rebuild` baut daraus alle abgeleiteten Tabellen ohne Netzwerk neu auf.
+
+Das Archiv ist lokal: es entsteht nur beim API-Backend und wird weder
+committet (.gitignore) noch vom Scraper-Workflow in CI befüllt. Es liegt
+neben der DB (DB_PATH / --db), außer PAYLOAD_ARCHIVE_DB setzt es explizit.
+"""
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+from schema import DB_NAME
+
+ARCHIVE_DB = os.getenv("PAYLOAD_ARCHIVE_DB") or os.path.join(os.path.dirname(DB_NAME), "payload_archive.db")
+ARCHIVE_LEVEL = int(os.getenv("PAYLOAD_ARCHIVE_LEVEL", "6"))
+
+PLAYER_STATS = "player_stats"
+CLUB_PROFILE = "club_profile"
+
+_pending = []
+_pending_lock = threading.Lock()
+_attached = False
+
+
+def attach_archive(conn, path: str | None = None):
+    """ATTACH the archive file as schema `archive` (outside any transaction) and create its table."""
+    global _attached
+    conn.execute("ATTACH DATABASE ? AS archive", (path or ARCHIVE_DB,))
+    conn.execute("PRAGMA archive.journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS archive.raw_payloads ("
+        "kind TEXT NOT NULL, key TEXT NOT NULL, fetched_at TEXT NOT NULL, fingerprint TEXT, "
+        "body BLOB NOT NULL, PRIMARY KEY(kind, key, fetched_at))"
+    )
+    _attached = True
+
+
+def encode(data) -> bytes:
+    return zlib.compress(json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), ARCHIVE_LEVEL)
+
+
+def decode(blob: bytes):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+_INSERT = (
+    "INSERT OR REPLACE INTO archive.raw_payloads (kind, key, fetched_at, fingerprint, body) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+
+def archive_payload(writer, kind: str, key, data, fetched_at: str, fingerprint: str | None = None):
+    """Queue one raw payload on `writer`; a second fetch on the same day replaces the first."""
+    writer.add(_INSERT, (kind, str(key), fetched_at, fingerprint, encode(data)))
+
+
+def record(kind: str, key, data, fetched_at: str):
+    """Remember a payload fetched in a worker thread; written by the next `save_pending`."""
+    if not _attached:
+        return
+    with _pending_lock:
+        _pending.append((kind, str(key), fetched_at, None, encode(data)))
+
+
+def save_pending(conn) -> int:
+    """Write payloads collected by `record`. Call from the DB-writer thread."""
+    with _pending_lock:
+        rows = list(_pending)
+        _pending.clear()
+    if rows:
+        conn.executemany(_INSERT, rows)
+    return len(rows)
+
+
+def archived_keys(kind: str, path: str | None = None) -> set:
+    """Keys with at least one archived payload of `kind` in the archive file (empty if it does not exist)."""
+    path = path or ARCHIVE_DB
+    if not os.path.exists(path):
+        return set()
+    conn = sqlite3.connect(path)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'raw_payloads'").fetchone():
+            return set()
+        return {r[0] for r in conn.execute("SELECT DISTINCT key FROM raw_payloads WHERE kind = ?", (kind,))}
+    finally:
+        conn.close()
+
+
+def iter_latest(conn, kind: str):
+    """Yield (key, fetched_at, data) for the most recent payload of every key of `kind`."""
+    # SQLite takes the bare columns of a MAX() aggregate from the row holding the maximum
+    cur = conn.execute(
+        "SELECT key, MAX(fetched_at), body FROM archive.raw_payloads WHERE kind = ? GROUP BY key",
+        (kind,)
+    )
+    for key, fetched_at, body in cur:
+        yield key, fetched_at, decode(body)
@@ -0,0 +1,109 @@
+"""
+Dead-Letter-Queue für fehlgeschlagene Stats-Abrufe.
+
+Statt einen Fehler sofort mit einem zweiten Request zu diagnostizieren, merkt
+sich der Lauf den strukturierten Fehler (Art, HTTP-Status, Detail) in
+`player_retry_queue`. Am Ende des Laufs folgen verzögerte Wiederholungs-
+durchgänge mit Backoff unter demselben Rate-Limit; was dann noch fehlt,
+bleibt in der Tabelle. Ein erfolgreicher Abruf entfernt den Eintrag.
+
+Der nächste Lauf richtet sich nach `attempts` und `last_failed_at`:
+vorübergehende Fehler werden in einem eigenen Durchgang vor dem Kader
+abgefragt, dauerhafte (404, ...) erst nach einem Backoff in Tagen, der sich
+pro Versuch verdoppelt. Nach QUEUE_MAX_ATTEMPTS dauerhaften Fehlern ruht der
+Spieler, bis sein Eintrag nach QUEUE_EXPIRE_DAYS verfällt.
+"""
+import datetime
+import os
+import sqlite3
+
+RETRY_PASSES = int(os.getenv("RETRY_PASSES", "2"))
+RETRY_BACKOFF_S = float(os.getenv("RETRY_BACKOFF_S", "15"))
+QUEUE_BACKOFF_DAYS = float(os.getenv("QUEUE_BACKOFF_DAYS", "7"))
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "4"))
+QUEUE_EXPIRE_DAYS = int(os.getenv("QUEUE_EXPIRE_DAYS", "90"))
+
+# Answers that a second attempt in the same run will not change
+PERMANENT_STATUSES = (400, 401, 403, 404, 410, 422)
+# Failures that repeat identically for the same payload (queued for the next run)
+NOT_RETRYABLE_ERRORS = ("parse",)
+
+
+def ensure_retry_table(cur):
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS player_retry_queue ("
+        "tm_id INTEGER PRIMARY KEY, error TEXT NOT NULL, status INTEGER, detail TEXT, "
+        "attempts INTEGER NOT NULL DEFAULT 1, first_failed_at TEXT NOT NULL, last_failed_at TEXT NOT NULL)"
+    )
+
+
+def is_retryable(error: dict) -> bool:
+    """Worth another attempt within this run's deferred passes."""
+    return error.get("error") not in NOT_RETRYABLE_ERRORS and error.get("status") not in PERMANENT_STATUSES
+
+
+def backoff_delay(retry_pass: int) -> float:
+    """Seconds to wait before deferred pass 1, 2, ... (doubling)."""
+    return RETRY_BACKOFF_S * 2 ** (retry_pass - 1)
+
+
+def record_failure(writer, tid, error: dict, failed_at: str):
+    writer.add(
+        "INSERT INTO player_retry_queue (tm_id, error, status, detail, attempts, first_failed_at, last_failed_at) "
+        "VALUES (?, ?, ?, ?, 1, ?, ?) "
+        "ON CONFLICT(tm_id) DO UPDATE SET error=excluded.error, status=excluded.status, detail=excluded.detail, "
+        "attempts=attempts + 1, last_failed_at=excluded.last_failed_at",
+        (tid, error["error"], error.get("status"), error.get("detail"), failed_at, failed_at)
+    )
+
+
+def clear_failure(writer, tid):
+    writer.add("DELETE FROM player_retry_queue WHERE tm_id = ?", (tid,))
+
+
+def load_queue(cur) -> dict:
+    """tm_id -> (error, status, attempts, last_failed_at) of every queued player."""
+    cur.execute("SELECT tm_id, error, status, attempts, last_failed_at FROM player_retry_queue")
+    return {r[0]: (r[1], r[2], r[3], r[4]) for r in cur.fetchall()}
+
+
+def next_due(status, attempts: int, last_failed_at: str):
+    """
+    Date from which a queued player is fetched again, or None once a
+    permanent failure reached QUEUE_MAX_ATTEMPTS (parked until it expires).
+    """
+    last = datetime.date.fromisoformat(last_failed_at[:10])
+    if status not in PERMANENT_STATUSES:
+        return last
+    if attempts >= QUEUE_MAX_ATTEMPTS:
+        return None
+    return last + datetime.timedelta(days=QUEUE_BACKOFF_DAYS * 2 ** (attempts - 1))
+
+
+def split_queue(queued: dict, today: str) -> tuple:
+    """(due, held) tm_id sets for a run on `today` (ISO date)."""
+    day = datetime.date.fromisoformat(today)
+    due, held = set(), set()
+    for tid, (_, status, attempts, last_failed_at) in queued.items():
+        when = next_due(status, attempts, last_failed_at)
+        (due if when is not None and when <= day else held).add(tid)
+    return due, held
+
+
+def prune_queue(conn: sqlite3.Connection, roster, today: str) -> int:
+    """
+    Drop entries of players no longer on the roster and entries whose last
+    failure is older than QUEUE_EXPIRE_DAYS. Returns rows removed.
+    """
+    expired_before = (datetime.date.fromisoformat(today) - datetime.timedelta(days=QUEUE_EXPIRE_DAYS)).isoformat()
+    with conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS retry_roster (tm_id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM temp.retry_roster")
+        conn.executemany("INSERT OR IGNORE INTO temp.retry_roster (tm_id) VALUES (?)", [(tid,) for tid in roster])
+        removed = conn.execute(
+            "DELETE FROM player_retry_queue WHERE tm_id NOT IN (SELECT tm_id FROM temp.retry_roster) "
+            "OR last_failed_at < ?",
+            (expired_before,)
+        ).rowcount
+        conn.execute("DELETE FROM temp.retry_roster")
+    return removed
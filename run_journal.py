@@ -0,0 +1,82 @@
+"""
+Lauf-Journal für die wöchentlichen API-Updates.
+
+Jeder Lauf bekommt eine Run-ID; das Journal hält den entdeckten Kader und pro
+Spieler, ob er fertig verarbeitet ist. Ein abgebrochener Lauf (Timeout,
+API weg) kann so mit `--resume` nur die restliche Arbeit nachholen.
+Done-Markierungen laufen über den BatchWriter und landen in derselben
+Transaktion wie die Spielerdaten.
+"""
+import datetime
+
+
+def ensure_journal_tables(cur):
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS update_runs ("
+        "run_id TEXT PRIMARY KEY, started_at TEXT NOT NULL, finished_at TEXT, "
+        "status TEXT NOT NULL, roster_complete INTEGER NOT NULL DEFAULT 0)"
+    )
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS update_run_players ("
+        "run_id TEXT NOT NULL, tm_id INTEGER NOT NULL, done INTEGER NOT NULL DEFAULT 0, "
+        "PRIMARY KEY(run_id, tm_id))"
+    )
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+
+def start_run(conn) -> str:
+    """Open a new run in state 'running' and return its id. Older unfinished runs are superseded."""
+    run_id = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    with conn:
+        conn.execute("UPDATE update_runs SET status = 'superseded' WHERE status = 'running'")
+        conn.execute(
+            "INSERT INTO update_runs (run_id, started_at, status) VALUES (?, ?, 'running')",
+            (run_id, _now())
+        )
+    return run_id
+
+
+def find_resumable_run(cur):
+    """(run_id, roster_complete) of the latest interrupted run, or None."""
+    cur.execute(
+        "SELECT run_id, roster_complete FROM update_runs WHERE status = 'running' "
+        "ORDER BY started_at DESC, run_id DESC LIMIT 1"
+    )
+    row = cur.fetchone()
+    return (row[0], bool(row[1])) if row else None
+
+
+def load_run_roster(cur, run_id):
+    """tm_id -> done flag for every player journaled under `run_id`."""
+    cur.execute("SELECT tm_id, done FROM update_run_players WHERE run_id = ?", (run_id,))
+    return {r[0]: bool(r[1]) for r in cur.fetchall()}
+
+
+def mark_player_done(writer, run_id, tid):
+    writer.add(
+        "INSERT INTO update_run_players (run_id, tm_id, done) VALUES (?, ?, 1) "
+        "ON CONFLICT(run_id, tm_id) DO UPDATE SET done=1",
+        (run_id, tid)
+    )
+
+
+def save_run_roster(conn, run_id, tm_ids):
+    """Journal the complete discovered roster; players already marked done keep their flag."""
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO update_run_players (run_id, tm_id, done) VALUES (?, ?, 0)",
+            [(run_id, tid) for tid in tm_ids]
+        )
+        conn.execute("UPDATE update_runs SET roster_complete = 1 WHERE run_id = ?", (run_id,))
+
+
+def finish_run(conn, run_id, status="done"):
+    with conn:
+        conn.execute(
+            "UPDATE update_runs SET status = ?, finished_at = ? WHERE run_id = ?",
+            (status, _now(), run_id)
+        )
+
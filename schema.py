@@ -0,0 +1,66 @@
+"""
+Gemeinsame Konfiguration und Schema der Update-Backends (API und Scraper).
+
+DB-Pfad, die Tabellen der Spieler-Statistiken und die Snapshot-Definitionen
+stehen nur hier; weekly_update, weekly_update_api, Shards und Rebuild
+importieren sie von hier, ohne dabei die Backends mitzuladen.
+Die Tabellen in server.js müssen dazu passen.
+"""
+import os
+
+# Same override as server.js
+DB_NAME = os.getenv("DB_PATH", "schweizer_fussball_grid.db")
+
+# (table, key column, value column, key in the aggregated stats dict); rows with value <= 0 are not kept
+STAT_SNAPSHOTS = (
+    ("player_club_goals", "club_name", "goals", "club_goals"),
+    ("player_club_assists", "club_name", "assists", "club_assists"),
+    ("player_club_appearances", "club_name", "appearances", "club_appearances"),
+    ("player_club_yellow_cards", "club_name", "yellow_cards", "club_yellow_cards"),
+    ("player_club_red_cards", "club_name", "red_cards", "club_red_cards"),
+    ("player_season_goals", "season_name", "goals", "season_goals"),
+    ("player_season_assists", "season_name", "assists", "season_assists"),
+)
+
+# Per-player tables a shard worker copies and the merge writes back
+SHARD_TABLES = (
+    "players", "player_fetch_state", "player_retry_queue", "player_leagues", "player_club_last_season",
+    *(table for table, *_ in STAT_SNAPSHOTS),
+)
+
+
+def ensure_players_columns(cur):
+    cur.execute("PRAGMA table_info(players)")
+    cols = {r[1] for r in cur.fetchall()}
+    if "in_switzerland" not in cols:
+        cur.execute("ALTER TABLE players ADD COLUMN in_switzerland INTEGER DEFAULT 0")
+    if "last_updated" not in cols:
+        cur.execute("ALTER TABLE players ADD COLUMN last_updated TEXT")
+
+
+def ensure_tables(cur):
+    for sql in [
+        "CREATE TABLE IF NOT EXISTS player_club_goals (tm_id INTEGER, club_name TEXT, goals INTEGER, PRIMARY KEY(tm_id, club_name))",
+        "CREATE TABLE IF NOT EXISTS player_club_assists (tm_id INTEGER, club_name TEXT, assists INTEGER, PRIMARY KEY(tm_id, club_name))",
+        "CREATE TABLE IF NOT EXISTS player_club_appearances (tm_id INTEGER, club_name TEXT, appearances INTEGER, PRIMARY KEY(tm_id, club_name))",
+        "CREATE TABLE IF NOT EXISTS player_club_yellow_cards (tm_id INTEGER, club_name TEXT, yellow_cards INTEGER, PRIMARY KEY(tm_id, club_name))",
+        "CREATE TABLE IF NOT EXISTS player_club_red_cards (tm_id INTEGER, club_name TEXT, red_cards INTEGER, PRIMARY KEY(tm_id, club_name))",
+        "CREATE TABLE IF NOT EXISTS player_club_last_season (tm_id INTEGER, club_name TEXT, last_season_year INTEGER, PRIMARY KEY(tm_id, club_name))",
+        "CREATE TABLE IF NOT EXISTS player_season_goals (tm_id INTEGER, season_name TEXT, goals INTEGER, PRIMARY KEY(tm_id, season_name))",
+        "CREATE TABLE IF NOT EXISTS player_season_assists (tm_id INTEGER, season_name TEXT, assists INTEGER, PRIMARY KEY(tm_id, season_name))",
+        "CREATE TABLE IF NOT EXISTS player_leagues (tm_id INTEGER, league_code TEXT)",
+        "CREATE INDEX IF NOT EXISTS idx_player_leagues_tm_id ON player_leagues (tm_id)",
+        "CREATE TABLE IF NOT EXISTS player_fetch_state (tm_id INTEGER PRIMARY KEY, fingerprint TEXT, etag TEXT, last_modified TEXT, changed_at TEXT)",
+    ]:
+        cur.execute(sql)
+
+
+def ensure_club_cache_table(cur):
+    # status: HTTP status of a failed lookup (NULL: timeout/connection error)
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS club_names ("
+        "club_id TEXT PRIMARY KEY, name TEXT, ok INTEGER NOT NULL, fetched_at TEXT NOT NULL, status INTEGER)"
+    )
+    cur.execute("PRAGMA table_info(club_names)")
+    if "status" not in {r[1] for r in cur.fetchall()}:
+        cur.execute("ALTER TABLE club_names ADD COLUMN status INTEGER")
@@ -94,6 +94,73 @@ function getLeagueSearchTerms(cat) {
     return Array.from(expanded);
 }
 
+// --- VORBERECHNETER KATEGORIE-INDEX (grid_index.py, letzte Stufe der Updates) ---
+// Teile, die im Index fehlen (z.B. vor dem ersten Update), nutzen weiter die LIKE-Abfragen.
+// gridBitsets: "category\u0000key" -> Bitset über Ordinalzahlen, gridOrdinalTmIds: Ordinalzahl -> tm_id.
+let gridIndexParts = new Set();
+let gridBitsets = new Map();
+let gridOrdinalTmIds = [];
+
+function loadGridIndex() {
+    // Eine Lesetransaktion, damit Teile, Ordinalzahlen und Bitsets zum selben Build gehören
+    let parts = [];
+    let ordinals = [];
+    let bitsets = [];
+    db.serialize(() => {
+        db.run("BEGIN");
+        db.all("SELECT part FROM grid_index_parts", [], (err, rows) => { parts = err || !rows ? [] : rows; });
+        db.all("SELECT ordinal, tm_id FROM grid_player_ordinals ORDER BY ordinal", [], (err, rows) => { ordinals = err || !rows ? [] : rows; });
+        db.all("SELECT category, key, bits FROM grid_category_bitsets", [], (err, rows) => { bitsets = err || !rows ? [] : rows; });
+        db.run("COMMIT", () => {
+            gridIndexParts = new Set(parts.map((r) => r.part));
+            gridOrdinalTmIds = ordinals.map((r) => r.tm_id);
+            gridBitsets = new Map(bitsets.map((r) => [`${r.category}\u0000${r.key}`, r.bits]));
+        });
+    });
+}
+loadGridIndex();
+setInterval(loadGridIndex, 10 * 60 * 1000).unref();
+
+// [category, key] in grid_category_players für cat (otherCat = andere Achse), sonst null
+function categoryIndexKey(cat, otherCat) {
+    if (!cat) return null;
+    const otherTeam = otherCat && otherCat.type === 'team' ? String(otherCat.value) : null;
+    let entry = null;
+    switch (cat.type) {
+        case 'team':
+        case 'league':
+            entry = [cat.type, String(cat.value || '').trim()]; break;
+        case 'red_card_club_1':
+        case 'yellow_cards_club_20':
+        case 'goals_club_50':
+        case 'assists_club_50':
+            entry = otherTeam ? [cat.type, otherTeam] : null; break;
+        case 'goals_season_10':
+            entry = otherTeam ? ['goals_season_10_club', otherTeam] : ['goals_season_10', '']; break;
+        case 'nation':
+            entry = ['nation', String(cat.value || '').trim()]; break;
+        case 'assists_season_10':
+        case 'champions_league':
+        case 'champion':
+        case 'cupwinner':
+        case 'world_cup':
+        case 'euro':
+        case 'national_team_appearances':
+            entry = [cat.type, '']; break;
+    }
+    return entry && gridIndexParts.has(entry[0]) ? entry : null;
+}
+
+// WHERE-Teil für "club_name passt zu clubKey": indexiert über club_key_names, sonst LIKE
+function clubNameClause(clubKey) {
+    if (gridIndexParts.has('club_keys')) {
+        return { sql: 'club_name IN (SELECT club_name FROM club_key_names WHERE club_key = ?)', params: [clubKey] };
+    }
+    const patterns = [`%${clubKey}%`];
+    if (CLUB_MAP[clubKey]) patterns.push(`%${CLUB_MAP[clubKey]}%`);
+    return { sql: `(${patterns.map(() => 'club_name LIKE ?').join(' OR ')})`, params: patterns };
+}
+
 // --- GRID GENERATOR (deterministisch pro Datum) ---
 
 function extractClubsFromGrid(gridData) {
@@ -358,12 +425,10 @@ function getLatestCareerSeasonYear(tmId) {
 
 function getClubAppearances(tmId, clubKey) {
     return new Promise((resolve) => {
-        const patterns = [`%${clubKey}%`];
-        if (CLUB_MAP[clubKey]) patterns.push(`%${CLUB_MAP[clubKey]}%`);
-        const placeholders = patterns.map(() => 'club_name LIKE ?').join(' OR ');
+        const club = clubNameClause(clubKey);
         db.get(
-            `SELECT appearances FROM player_club_appearances WHERE tm_id = ? AND (${placeholders}) LIMIT 1`,
-            [tmId, ...patterns],
+            `SELECT appearances FROM player_club_appearances WHERE tm_id = ? AND ${club.sql} LIMIT 1`,
+            [tmId, ...club.params],
             (err, row) => resolve(row ? (row.appearances || 0) : 0)
         );
     });
@@ -371,12 +436,10 @@ function getClubAppearances(tmId, clubKey) {
 
 function getClubStatValue(tmId, clubKey, table, col) {
     return new Promise((resolve) => {
-        const patterns = [`%${clubKey}%`];
-        if (CLUB_MAP[clubKey]) patterns.push(`%${CLUB_MAP[clubKey]}%`);
-        const placeholders = patterns.map(() => 'club_name LIKE ?').join(' OR ');
+        const club = clubNameClause(clubKey);
         db.get(
-            `SELECT MAX(${col}) AS v FROM ${table} WHERE tm_id = ? AND (${placeholders})`,
-            [tmId, ...patterns],
+            `SELECT MAX(${col}) AS v FROM ${table} WHERE tm_id = ? AND ${club.sql}`,
+            [tmId, ...club.params],
             (err, row) => resolve(row && row.v != null ? Number(row.v) : 0)
         );
     });
@@ -394,12 +457,10 @@ function getSeasonStatValue(tmId, table, col) {
 
 function getClubLastSeasonYear(tmId, clubKey) {
     return new Promise((resolve) => {
-        const patterns = [`%${clubKey}%`];
-        if (CLUB_MAP[clubKey]) patterns.push(`%${CLUB_MAP[clubKey]}%`);
-        const placeholders = patterns.map(() => 'club_name LIKE ?').join(' OR ');
+        const club = clubNameClause(clubKey);
         db.get(
-            `SELECT MAX(last_season_year) AS y FROM player_club_last_season WHERE tm_id = ? AND (${placeholders})`,
-            [tmId, ...patterns],
+            `SELECT MAX(last_season_year) AS y FROM player_club_last_season WHERE tm_id = ? AND ${club.sql}`,
+            [tmId, ...club.params],
             (err, row) => resolve(row && row.y ? row.y : null)
         );
     });
@@ -542,6 +603,16 @@ async function calculateRarity(player, rowCat, colCat) {
 }
 
 async function evaluateCategory(tmId, cat, otherCat) {
+    const indexed = categoryIndexKey(cat, otherCat);
+    if (indexed) {
+        return new Promise(resolve => {
+            db.get(
+                "SELECT 1 FROM grid_category_players WHERE category = ? AND key = ? AND tm_id = ?",
+                [...indexed, tmId],
+                (e, r) => resolve(!!r)
+            );
+        });
+    }
     if (cat.type === 'red_card_club_1') {
         if (!otherCat || otherCat.type !== 'team') return false;
         return new Promise(resolve => {
@@ -707,6 +778,15 @@ app.get('/api/leaderboard', (req, res) => {
 // --- Lösungen: Ein gültiger Spieler pro Zelle (nur nach Spielende sinnvoll) ---
 function getCandidateTmIds(cat, otherCat) {
     return new Promise((resolve) => {
+        const indexed = categoryIndexKey(cat, otherCat);
+        if (indexed) {
+            db.all(
+                "SELECT tm_id FROM grid_category_players WHERE category = ? AND key = ?",
+                indexed,
+                (e, rows) => resolve((rows || []).map((r) => r.tm_id))
+            );
+            return;
+        }
         if (cat.type === 'red_card_club_1') {
             if (!otherCat || otherCat.type !== 'team') return resolve([]);
             db.all(
@@ -771,7 +851,34 @@ function getCandidateTmIds(cat, otherCat) {
     });
 }
 
+// Kleinste tm_id in beiden Bitsets (exaktes AND), -1 wenn leer
+function firstCommonTmId(rowBits, colBits) {
+    const n = Math.min(rowBits.length, colBits.length);
+    for (let i = 0; i < n; i++) {
+        const both = rowBits[i] & colBits[i];
+        if (both) return gridOrdinalTmIds[i * 8 + 31 - Math.clz32(both & -both)];
+    }
+    return -1;
+}
+
+function cellBitsets(rowCat, colCat) {
+    const rowKey = categoryIndexKey(rowCat, colCat);
+    const colKey = categoryIndexKey(colCat, rowCat);
+    if (!rowKey || !colKey || !gridIndexParts.has('bitsets')) return null;
+    // Ohne Bitset ist die Kategorie leer (nur gebaute Teile haben einen categoryIndexKey)
+    const empty = Buffer.alloc(0);
+    return [gridBitsets.get(rowKey.join('\u0000')) || empty, gridBitsets.get(colKey.join('\u0000')) || empty];
+}
+
 async function getOneValidPlayerForCell(rowCat, colCat) {
+    const bitsets = cellBitsets(rowCat, colCat);
+    if (bitsets) {
+        const tmId = firstCommonTmId(...bitsets);
+        if (tmId < 0) return null;
+        return new Promise((resolve) => {
+            db.get("SELECT name FROM players WHERE tm_id = ?", [tmId], (err, row) => resolve(row ? row.name.trim() : null));
+        });
+    }
     const [rowIds, colIds] = await Promise.all([
         getCandidateTmIds(rowCat, colCat),
         getCandidateTmIds(colCat, rowCat)
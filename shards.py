@@ -0,0 +1,205 @@
+"""
+Sharded API-Updates: mehrere Worker mit je einer kleinen SQLite-Shard-DB.
+
+`--shard k/n` verarbeitet nur Spieler mit tm_id % n == k - 1. Der Worker
+arbeitet auf shards/shard_k_of_n.db, die beim Start mit seinen Spielern,
+deren abgeleiteten Zeilen, Fetch-States und dem Club-Cache aus der Haupt-DB
+befüllt wird; Journal (--resume) und Payload-Archiv laufen pro Shard wie
+gewohnt. Der Kader wird einmal vorab ermittelt (shards/roster_of_n.txt) und
+allen Workern mitgegeben, statt dass jeder Shard die Discovery wiederholt.
+`merge_shards` übernimmt danach alle Shards in einer Transaktion als
+Mengen-Diff in die Haupt-DB; Kader-Flags und Grid-Index laufen über
+`finalize` in derselben Transaktion.
+"""
+import os
+import re
+import sqlite3
+
+SHARD_DIR = os.getenv("SHARD_DIR", "shards")
+
+
+def parse_shard_spec(spec: str) -> tuple:
+    """'3/8' -> (3, 8); k is 1-based."""
+    m = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec or "")
+    if not m or not 1 <= int(m.group(1)) <= int(m.group(2)):
+        raise ValueError(f"Invalid shard spec {spec!r}, expected k/n with 1 <= k <= n")
+    return int(m.group(1)), int(m.group(2))
+
+
+def shard_path(index: int, count: int, suffix: str = "db") -> str:
+    return os.path.join(SHARD_DIR, f"shard_{index}_of_{count}.{suffix}")
+
+
+def roster_path(count: int) -> str:
+    return os.path.join(SHARD_DIR, f"roster_of_{count}.txt")
+
+
+def save_roster(path: str, tm_ids):
+    """Write player ids one per line (the `cli.py discover --output` format)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(f"{tid}\n" for tid in sorted(tm_ids))
+
+
+def load_roster(path: str) -> set:
+    with open(path, encoding="utf-8") as f:
+        return {int(line) for line in f if line.strip()}
+
+
+def _remove_db_files(path):
+    for p in (path, f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def _table_sql(conn, schema, table):
+    row = conn.execute(f"SELECT sql FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return row[0] if row else None
+
+
+def _columns(conn, schema, table) -> list:
+    return [r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def prepare_shard(main_db: str, index: int, count: int, player_tables) -> str:
+    """
+    Create a fresh shard DB for shard `index`/`count`: the rows of its players
+    from every table in `player_tables` (same schema as `main_db`) plus the
+    whole club_names cache. Returns the shard path.
+    """
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    path = shard_path(index, count)
+    _remove_db_files(path)
+    _remove_db_files(shard_path(index, count, "archive.db"))
+    conn = sqlite3.connect(path)
+    conn.execute("ATTACH DATABASE ? AS src", (main_db,))
+    with conn:
+        for table in (*player_tables, "club_names"):
+            sql = _table_sql(conn, "src", table)
+            if not sql:
+                continue
+            conn.execute(sql)
+            where = "" if table == "club_names" else " WHERE tm_id % ? = ?"
+            conn.execute(f"INSERT INTO main.{table} SELECT * FROM src.{table}{where}",
+                         () if table == "club_names" else (count, index - 1))
+    conn.execute("DETACH DATABASE src")
+    conn.close()
+    return path
+
+
+def _finished_roster(path) -> set:
+    """Roster of the shard's latest run; raises unless that run finished."""
+    conn = sqlite3.connect(path)
+    try:
+        row = conn.execute(
+            "SELECT run_id, status FROM update_runs ORDER BY started_at DESC, run_id DESC LIMIT 1"
+        ).fetchone()
+        if not row or row[1] != "done":
+            raise RuntimeError(f"Shard {path} has no finished run (status: {row[1] if row else 'none'})")
+        return {r[0] for r in conn.execute("SELECT tm_id FROM update_run_players WHERE run_id = ?", (row[0],))}
+    finally:
+        conn.close()
+
+
+def finished_on_roster(index: int, count: int, roster) -> bool:
+    """Whether the latest run of shard `index`/`count` finished on exactly `roster`."""
+    path = shard_path(index, count)
+    if not os.path.exists(path):
+        return False
+    try:
+        return _finished_roster(path) == set(roster)
+    except (RuntimeError, sqlite3.Error):
+        return False
+
+
+def _stage(conn, path, tables):
+    """Append one shard's rows to temp.merge_<table> (outside any main-DB transaction)."""
+    conn.execute("ATTACH DATABASE ? AS shard", (path,))
+    try:
+        with conn:
+            for table in tables:
+                if not _table_sql(conn, "shard", table):
+                    continue
+                shard_cols = set(_columns(conn, "shard", table))
+                cols = ", ".join(c for c in _columns(conn, "main", table) if c in shard_cols)
+                conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS merge_{table} AS SELECT {cols} FROM main.{table} WHERE 0")
+                conn.execute(f"INSERT INTO temp.merge_{table} ({cols}) SELECT {cols} FROM shard.{table}")
+    finally:
+        conn.execute("DETACH DATABASE shard")
+
+
+def _merge_archive(conn, path):
+    if not os.path.exists(path):
+        return
+    conn.execute("ATTACH DATABASE ? AS shard_archive", (path,))
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO archive.raw_payloads SELECT * FROM shard_archive.raw_payloads")
+    finally:
+        conn.execute("DETACH DATABASE shard_archive")
+
+
+def merge_shards(conn, count: int, player_tables, finalize=None) -> tuple:
+    """
+    Merge shards 1..`count` into `conn` (the main DB, archive attached).
+    Every shard must have finished its run, otherwise nothing is merged.
+    Shard rows are staged in temp tables, then applied in one transaction,
+    touching only rows that differ: players/fetch state are updated, the
+    derived tables of shard players become exactly the shard's rows and
+    club names are taken when newer. `finalize(conn, roster)` runs last in
+    the same transaction (flags, grid index); if it raises, nothing of the
+    merge is committed. Returns (roster, changed row count).
+    """
+    paths = [shard_path(k, count) for k in range(1, count + 1)]
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        raise RuntimeError(f"Missing shards: {', '.join(missing)}")
+    roster = set()
+    for path in paths:
+        roster |= _finished_roster(path)
+
+    staged = [t for t in (*player_tables, "club_names") if _table_sql(conn, "main", t)]
+    for index, path in enumerate(paths, 1):
+        _stage(conn, path, staged)
+        _merge_archive(conn, shard_path(index, count, "archive.db"))
+    staged = [t for t in staged if _table_sql(conn, "temp", f"merge_{t}")]
+
+    changed = 0
+    with conn:
+        for table in staged:
+            if table != "club_names":
+                conn.execute(f"CREATE INDEX IF NOT EXISTS temp.merge_{table}_tm ON merge_{table} (tm_id)")
+        for table in staged:
+            cols = _columns(conn, "temp", f"merge_{table}")
+            col_list = ", ".join(cols)
+            if table == "club_names":
+                updates = ", ".join(f"{c}=excluded.{c}" for c in cols if c != "club_id")
+                changed += conn.execute(
+                    f"INSERT INTO club_names ({col_list}) SELECT {col_list} FROM temp.merge_club_names WHERE true "
+                    f"ON CONFLICT(club_id) DO UPDATE SET {updates} "
+                    "WHERE excluded.fetched_at > club_names.fetched_at"
+                ).rowcount
+            elif table == "players":
+                # in_switzerland is set from the merged roster afterwards
+                upd = [c for c in cols if c not in ("tm_id", "in_switzerland")]
+                changed += conn.execute(
+                    f"UPDATE players SET ({', '.join(upd)}) = "
+                    f"(SELECT {', '.join(upd)} FROM temp.merge_players m WHERE m.tm_id = players.tm_id) "
+                    f"WHERE tm_id IN (SELECT tm_id FROM (SELECT tm_id, {', '.join(upd)} FROM temp.merge_players "
+                    f"EXCEPT SELECT tm_id, {', '.join(upd)} FROM players))"
+                ).rowcount
+            else:
+                same = " AND ".join(f"m.{c} IS {table}.{c}" for c in cols)
+                changed += conn.execute(
+                    f"DELETE FROM {table} WHERE tm_id IN (SELECT tm_id FROM temp.merge_players) "
+                    f"AND NOT EXISTS (SELECT 1 FROM temp.merge_{table} m WHERE {same})"
+                ).rowcount
+                changed += conn.execute(
+                    f"INSERT INTO {table} ({col_list}) SELECT {col_list} FROM temp.merge_{table} "
+                    f"EXCEPT SELECT {col_list} FROM {table}"
+                ).rowcount
+        for table in staged:
+            conn.execute(f"DROP TABLE temp.merge_{table}")
+        if finalize:
+            finalize(conn, roster)
+    return roster, changed
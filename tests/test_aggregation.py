@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+import api_stats
+
+VALUES = [None, 0, 1, 2, "3", "1.234", "-", "", " 7 ", 12, "x", 3.0, True]
+STAT_KEYS = [
+    "appearances", "goals", "assists", "yellowCards", "yellow_cards", "secondYellowCards",
+    "second_yellow_cards", "redCards", "red_cards",
+]
+ID_POOLS = [
+    ("clubId", ["", None, 5, "17", "42", 0]), ("club_id", ["9", None, "17"]),
+    ("seasonId", ["2024", "1999", "x", "", None, 2023, "2010"]), ("season_id", ["2021", None]),
+    ("competitionName", ["Super League", " Super League ", "", None, "Cup"]), ("competition_name", ["Liga", None]),
+]
+MALFORMED = [None, [], {}, {"stats": "x"}, {"stats": [1]}, {"stats": None}, {"stats": [{"goals": [1]}]}]
+
+
+@pytest.fixture(autouse=True)
+def offline_clubs(monkeypatch):
+    # Known names, one placeholder (unresolved) and no network lookups
+    monkeypatch.setattr(api_stats, "_offline", True)
+    monkeypatch.setattr(api_stats, "_club_name_cache", {"5": "FC A", "17": "FC B", "42": "FC A", "0": "Zero", "9": "Verein_9"})
+    monkeypatch.setattr(api_stats, "_club_cache_pending", {})
+    monkeypatch.setattr(api_stats, "_unresolved_clubs", {"9"})
+
+
+def _row(rng):
+    row = {key: rng.choice(VALUES) for key in STAT_KEYS if rng.random() < 0.7}
+    row.update({key: rng.choice(pool) for key, pool in ID_POOLS if rng.random() < 0.7})
+    return row
+
+
+def _normalised(stats):
+    return None if stats is None else {**stats, "leagues": sorted(stats["leagues"])}
+
+
+def _scalar(data):
+    try:
+        return api_stats.aggregate_player_stats(data)
+    except Exception:
+        return None
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_batch_matches_scalar(seed):
+    rng = random.Random(seed)
+    payloads = {
+        tid: {"stats": [_row(rng) for _ in range(rng.randint(0, 12))]} if rng.random() > 0.1 else rng.choice(MALFORMED)
+        for tid in range(rng.randint(1, 30))
+    }
+    batch = api_stats.aggregate_player_stats_batch(payloads)
+    assert set(batch) == set(payloads)
+    for tid, data in payloads.items():
+        assert _normalised(batch[tid]) == _normalised(_scalar(data)), (tid, data)
+
+
+def test_bad_payload_does_not_affect_other_players():
+    good = {"stats": [{"clubId": "5", "seasonId": "2024", "competitionName": "Super League", "goals": "3", "appearances": 10}]}
+    bad = {2: {"stats": [1]}, 3: {"stats": "x"}, 4: None}
+    batch = api_stats.aggregate_player_stats_batch({1: good, **bad})
+    for tid, data in bad.items():
+        assert _normalised(batch[tid]) == _normalised(_scalar(data))
+    assert _normalised(batch[1]) == _normalised(api_stats.aggregate_player_stats(good))
+    assert batch[1]["club_goals"] == {"FC A": 3}
+
+
+def test_only_transient_club_failures_count_as_unresolved(monkeypatch):
+    monkeypatch.setattr(api_stats, "_club_name_cache", {})
+    api_stats._remember_club_name("404", None, 404)
+    api_stats._remember_club_name("503", None, 503)
+    api_stats._remember_club_name("t", None)
+    data = {"stats": [{"clubId": c, "seasonId": "2024", "goals": 1} for c in ("404", "503", "t")]}
+    stats = api_stats.aggregate_player_stats(data)
+    assert stats["unresolved_clubs"] == ["503", "t"]
+    assert stats["club_goals"] == {"Verein_404": 1, "Verein_503": 1, "Verein_t": 1}
+    assert api_stats.aggregate_player_stats_batch({1: data})[1]["unresolved_clubs"] == ["503", "t"]
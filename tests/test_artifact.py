@@ -0,0 +1,119 @@
+import shutil
+import sqlite3
+
+from artifact import apply_deltas, compact_database, export_delta
+
+
+def _rows(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(conn.execute(f"SELECT * FROM {table}"), key=repr)
+    finally:
+        conn.close()
+
+
+def _tables(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        conn.close()
+
+
+def _make_db(path):
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("CREATE TABLE players (tm_id INTEGER PRIMARY KEY, name TEXT, in_switzerland INTEGER)")
+        conn.execute("CREATE TABLE player_leagues (tm_id INTEGER, league_code TEXT, PRIMARY KEY(tm_id, league_code))")
+        conn.execute("CREATE TABLE player_fetch_state (tm_id INTEGER PRIMARY KEY, fingerprint BLOB, etag TEXT)")
+        conn.execute("CREATE TABLE legacy (x INTEGER)")
+        conn.execute("CREATE TABLE update_runs (run_id INTEGER PRIMARY KEY, status TEXT)")
+        conn.executemany("INSERT INTO players VALUES (?, ?, ?)", [(1, "Müller", 1), (2, "Rossi", 0), (3, None, 1)])
+        conn.executemany("INSERT INTO player_leagues VALUES (?, ?)", [(1, "Super League"), (2, "Serie A")])
+        conn.executemany("INSERT INTO player_fetch_state VALUES (?, ?, ?)", [(1, b"\x00\xff", None), (2, b"ab", "e2")])
+        conn.execute("INSERT INTO legacy VALUES (1)")
+        conn.execute("INSERT INTO update_runs VALUES (1, 'done')")
+    conn.close()
+
+
+def _change(path):
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("UPDATE players SET in_switzerland = 0 WHERE tm_id = 1")
+        conn.execute("DELETE FROM players WHERE tm_id = 3")
+        conn.execute("INSERT INTO players VALUES (4, 'Nový', 1)")
+        conn.execute("INSERT INTO player_leagues VALUES (4, 'Super League')")
+        conn.execute("UPDATE player_fetch_state SET fingerprint = ?, etag = NULL WHERE tm_id = 2", (b"\x01\x02",))
+        conn.execute("DROP TABLE legacy")
+        conn.execute("CREATE TABLE club_names (club_id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO club_names VALUES (7, 'FC Thun')")
+        conn.execute("INSERT INTO update_runs VALUES (2, 'running')")
+    conn.close()
+
+
+def test_delta_round_trip(tmp_path):
+    old, new, target = tmp_path / "old.db", tmp_path / "new.db", tmp_path / "target.db"
+    _make_db(old)
+    shutil.copyfile(old, new)
+    shutil.copyfile(old, target)
+    _change(new)
+
+    stats = export_delta(str(old), str(new), str(tmp_path / "d.jsonl.gz"))
+    assert stats == {"tables": 5, "inserted": 5, "deleted": 3}
+    apply_deltas(str(target), [str(tmp_path / "d.jsonl.gz")])
+
+    for table in ("players", "player_leagues", "player_fetch_state", "club_names"):
+        assert _rows(target, table) == _rows(new, table)
+    assert "legacy" not in _tables(target)
+    # Local bookkeeping is not shipped
+    assert _rows(target, "update_runs") == [(1, "done")]
+
+
+def test_delta_is_deterministic(tmp_path):
+    old, new = tmp_path / "old.db", tmp_path / "new.db"
+    _make_db(old)
+    shutil.copyfile(old, new)
+    _change(new)
+    export_delta(str(old), str(new), str(tmp_path / "a.jsonl.gz"))
+    export_delta(str(old), str(new), str(tmp_path / "b.jsonl.gz"))
+    assert (tmp_path / "a.jsonl.gz").read_bytes() == (tmp_path / "b.jsonl.gz").read_bytes()
+
+
+def test_apply_deltas_skips_applied_files(tmp_path):
+    old, new, target = tmp_path / "old.db", tmp_path / "new.db", tmp_path / "target.db"
+    _make_db(old)
+    shutil.copyfile(old, new)
+    shutil.copyfile(old, target)
+    _change(new)
+    delta = str(tmp_path / "d.jsonl.gz")
+    export_delta(str(old), str(new), delta)
+
+    assert list(apply_deltas(str(target), [delta])) == ["d.jsonl.gz"]
+    assert apply_deltas(str(target), [delta]) == {}
+    assert _rows(target, "player_leagues") == _rows(new, "player_leagues")
+
+
+def test_snapshot_keeps_run_state_unless_asked(tmp_path):
+    db = tmp_path / "db.db"
+    _make_db(db)
+    apply_deltas(str(db), [])
+    compact_database(str(db))
+    assert {"update_runs", "grid_index_parts"} <= _tables(db)
+    assert "applied_deltas" not in _tables(db)
+    compact_database(str(db), drop_run_state=True)
+    assert "update_runs" not in _tables(db)
+    assert "grid_index_parts" in _tables(db)
+
+
+def test_snapshot_replays_from_empty(tmp_path):
+    db, target = tmp_path / "db.db", tmp_path / "target.db"
+    _make_db(db)
+    compact_database(str(db), drop_run_state=True)
+
+    # A delta against an empty base recreates the whole snapshot
+    export_delta(None, str(db), str(tmp_path / "full.jsonl.gz"))
+    sqlite3.connect(target).close()
+    apply_deltas(str(target), [str(tmp_path / "full.jsonl.gz")])
+    for table in ("players", "player_leagues", "player_fetch_state", "legacy"):
+        assert _rows(target, table) == _rows(db, table)
+    assert "grid_index_parts" in _tables(target)
@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+import api_stats
+from schema import ensure_club_cache_table
+
+
+class _Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    for name, value in (("_club_name_cache", {}), ("_club_cache_pending", {}),
+                        ("_unresolved_clubs", set()), ("_stale_club_names", {})):
+        monkeypatch.setattr(api_stats, name, value)
+    monkeypatch.setattr(api_stats, "_offline", False)
+    conn = sqlite3.connect(":memory:")
+    ensure_club_cache_table(conn.cursor())
+    with conn:
+        conn.execute("INSERT INTO club_names (club_id, name, ok, fetched_at) VALUES ('7', 'FC Thun', 1, '2020-01-01T00:00:00+00:00')")
+    api_stats.load_club_cache(conn)
+    return conn
+
+
+def _rows(conn):
+    return conn.execute("SELECT club_id, name, ok, fetched_at FROM club_names").fetchall()
+
+
+@pytest.mark.parametrize("response", [_Response(503), _Response(404), ConnectionError("down")])
+def test_failed_refresh_keeps_the_expired_name(cache, monkeypatch, response):
+    def api_get(path, label):
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(api_stats, "api_get", api_get)
+    assert api_stats._get_club_name("7") == "FC Thun"
+    assert "7" not in api_stats._unresolved_clubs
+    api_stats.save_club_cache(cache)
+    assert _rows(cache) == [("7", "FC Thun", 1, "2020-01-01T00:00:00+00:00")]
+
+
+def test_successful_refresh_updates_name_and_fetched_at(cache, monkeypatch):
+    monkeypatch.setattr(api_stats, "api_get", lambda path, label: _Response(200, {"name": "FC Thun 1898"}))
+    monkeypatch.setattr(api_stats.payload_archive, "record", lambda *args: None)
+    assert api_stats._get_club_name("7") == "FC Thun 1898"
+    api_stats.save_club_cache(cache)
+    [(club_id, name, ok, fetched_at)] = _rows(cache)
+    assert (club_id, name, ok) == ("7", "FC Thun 1898", 1)
+    assert fetched_at > "2020-01-01"
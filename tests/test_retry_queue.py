@@ -0,0 +1,36 @@
+import sqlite3
+
+from retry_queue import QUEUE_MAX_ATTEMPTS, ensure_retry_table, is_retryable, load_queue, prune_queue, split_queue
+
+
+def test_split_queue_backs_off_and_parks_permanent_failures():
+    queued = {
+        1: ("http", 503, 3, "2026-10-10"),                     # transient: due at once
+        2: ("http", 404, 1, "2026-10-17"),                     # permanent, failed today
+        3: ("http", 404, 1, "2026-10-09"),                     # first backoff (7 days) passed
+        4: ("http", 404, 2, "2026-10-09"),                     # second backoff (14 days) not yet
+        5: ("http", 404, QUEUE_MAX_ATTEMPTS, "2026-06-01"),    # parked
+    }
+    due, held = split_queue(queued, "2026-10-17")
+    assert due == {1, 3}
+    assert held == {2, 4, 5}
+
+
+def test_prune_queue_drops_unlisted_and_expired_entries():
+    conn = sqlite3.connect(":memory:")
+    ensure_retry_table(conn.cursor())
+    with conn:
+        conn.executemany(
+            "INSERT INTO player_retry_queue (tm_id, error, status, attempts, first_failed_at, last_failed_at) "
+            "VALUES (?, 'http', 404, 1, ?, ?)",
+            [(1, "2026-10-10", "2026-10-10"), (2, "2026-10-10", "2026-10-10"), (3, "2026-01-01", "2026-01-01")]
+        )
+    assert prune_queue(conn, {1, 3}, "2026-10-17") == 2
+    assert set(load_queue(conn.cursor())) == {1}
+
+
+def test_parse_and_permanent_failures_are_not_retried_in_the_run():
+    assert is_retryable({"error": "timeout", "status": None})
+    assert is_retryable({"error": "http_status", "status": 503})
+    assert not is_retryable({"error": "http_status", "status": 404})
+    assert not is_retryable({"error": "parse", "status": None})
@@ -0,0 +1,127 @@
+import sqlite3
+
+import pytest
+
+import shards
+from db_writer import set_roster_flags
+from payload_archive import attach_archive
+from retry_queue import ensure_retry_table
+from run_journal import ensure_journal_tables, finish_run, save_run_roster, start_run
+from schema import SHARD_TABLES, ensure_club_cache_table, ensure_players_columns, ensure_tables
+
+PLAYERS = range(1, 9)
+COMPARED = ("players", "player_club_goals", "player_leagues", "player_fetch_state", "club_names")
+
+
+def _make_main(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE players (tm_id INTEGER PRIMARY KEY, name TEXT)")
+    cur = conn.cursor()
+    ensure_players_columns(cur)
+    ensure_tables(cur)
+    ensure_club_cache_table(cur)
+    ensure_retry_table(cur)
+    with conn:
+        conn.executemany("INSERT INTO players (tm_id, name) VALUES (?, ?)", [(tid, f"Player {tid}") for tid in PLAYERS])
+        conn.executemany("INSERT INTO player_club_goals VALUES (?, 'FC Thun', ?)", [(tid, tid) for tid in PLAYERS])
+        conn.executemany("INSERT INTO player_leagues VALUES (?, 'Super League')", [(tid,) for tid in PLAYERS])
+        conn.execute("INSERT INTO club_names (club_id, name, ok, fetched_at) VALUES ('7', 'FC Thun', 1, '2026-01-01T00:00:00+00:00')")
+    conn.close()
+
+
+def _update(conn, tids):
+    """What a run does to its players (and the club cache)."""
+    with conn:
+        for tid in tids:
+            conn.execute("UPDATE players SET last_updated = '2026-10-17' WHERE tm_id = ?", (tid,))
+            conn.execute("UPDATE player_club_goals SET goals = goals + 10 WHERE tm_id = ?", (tid,))
+            if tid % 3 == 0:
+                conn.execute("DELETE FROM player_leagues WHERE tm_id = ?", (tid,))
+            else:
+                conn.execute("INSERT INTO player_leagues VALUES (?, 'Cup')", (tid,))
+            conn.execute("INSERT OR REPLACE INTO player_fetch_state (tm_id, fingerprint) VALUES (?, ?)", (tid, f"f{tid}"))
+        conn.execute("UPDATE club_names SET name = 'FC Thun 1898', fetched_at = '2026-10-17T00:00:00+00:00'")
+
+
+def _run_shard(path, roster, status="done"):
+    conn = sqlite3.connect(path)
+    ensure_journal_tables(conn.cursor())
+    _update(conn, [r[0] for r in conn.execute("SELECT tm_id FROM players")])
+    run_id = start_run(conn)
+    save_run_roster(conn, run_id, roster)
+    finish_run(conn, run_id, status)
+    conn.close()
+
+
+def _rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {t: sorted(conn.execute(f"SELECT * FROM {t}"), key=repr) for t in COMPARED}
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(shards, "SHARD_DIR", str(tmp_path / "shards"))
+    main, expected = str(tmp_path / "main.db"), str(tmp_path / "expected.db")
+    _make_main(main)
+    _make_main(expected)
+    # A single run over the whole roster, flags included
+    roster = set(PLAYERS) - {8}
+    conn = sqlite3.connect(expected)
+    _update(conn, PLAYERS)
+    with conn:
+        set_roster_flags(conn, roster)
+    conn.close()
+    for k in (1, 2):
+        shards.prepare_shard(main, k, 2, SHARD_TABLES)
+    return main, expected, roster, tmp_path
+
+
+def _merge(main, archive, finalize):
+    conn = sqlite3.connect(main)
+    attach_archive(conn, archive)
+    try:
+        return shards.merge_shards(conn, 2, SHARD_TABLES, finalize=finalize)
+    finally:
+        conn.close()
+
+
+def _flags(conn, roster):
+    set_roster_flags(conn, roster)
+
+
+def test_merge_matches_single_run(setup):
+    main, expected, roster, tmp_path = setup
+    for k in (1, 2):
+        _run_shard(shards.shard_path(k, 2), roster)
+    merged_roster, changed = _merge(main, str(tmp_path / "archive.db"), _flags)
+    assert merged_roster == roster
+    assert changed > 0
+    assert _rows(main) == _rows(expected)
+
+
+def test_failing_finalize_rolls_back_the_merge(setup):
+    main, _, roster, tmp_path = setup
+    before = _rows(main)
+    for k in (1, 2):
+        _run_shard(shards.shard_path(k, 2), roster)
+
+    def _fail(conn, roster):
+        set_roster_flags(conn, roster)
+        raise RuntimeError("roster too small")
+
+    with pytest.raises(RuntimeError, match="roster too small"):
+        _merge(main, str(tmp_path / "archive.db"), _fail)
+    assert _rows(main) == before
+
+
+def test_unfinished_shard_blocks_the_merge(setup):
+    main, _, roster, tmp_path = setup
+    before = _rows(main)
+    _run_shard(shards.shard_path(1, 2), roster)
+    _run_shard(shards.shard_path(2, 2), roster, status="running")
+    with pytest.raises(RuntimeError, match="no finished run"):
+        _merge(main, str(tmp_path / "archive.db"), _flags)
+    assert _rows(main) == before
@@ -0,0 +1,79 @@
+"""
+Schlankes Parsen der Transfermarkt-Seiten für den Scraper (weekly_update).
+
+Es wird nur gebaut, was gebraucht wird (SoupStrainer): die Spielerlinks der
+Kaderseite bzw. tfoot/tbody der Leistungsdaten. Mit installiertem lxml wird
+dessen C-Parser verwendet, sonst html.parser. Die Ergebnisse entsprechen den
+bisherigen Dicts aus weekly_update.get_player_stats.
+"""
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+_PLAYER_HREF = re.compile(r'/profil/spieler/(\d+)')
+_PLAYER_ID = re.compile(r'/spieler/(\d+)')
+_ROSTER_LINKS = SoupStrainer('a', href=_PLAYER_HREF)
+_STATS_TABLES = SoupStrainer(['tfoot', 'tbody'])
+
+
+def _clean_val(cell):
+    txt = cell.get_text().strip().replace('.', '').replace(',', '').replace('-', '0')
+    return int(txt) if txt.isdigit() else 0
+
+
+def parse_roster_ids(content) -> set:
+    """Spieler-IDs aller /profil/spieler/<id>-Links einer Kaderseite."""
+    soup = BeautifulSoup(content, HTML_PARSER, parse_only=_ROSTER_LINKS)
+    ids = set()
+    for link in soup.find_all('a', href=True):
+        m = _PLAYER_ID.search(link['href'])
+        if m:
+            ids.add(int(m.group(1)))
+    return ids
+
+
+def parse_player_stats(content) -> dict | None:
+    """Footer-Summen plus Club-/Saison-Tore und -Assists einer Leistungsdaten-Seite, None ohne Footer."""
+    soup = BeautifulSoup(content, HTML_PARSER, parse_only=_STATS_TABLES)
+    footer = soup.find('tfoot')
+    if not footer:
+        return None
+    cells = footer.find_all('td')
+    if len(cells) <= 6:
+        return None
+
+    result = {'e': _clean_val(cells[4]), 't': _clean_val(cells[5]), 'a': _clean_val(cells[6])}
+
+    # Detaillierte Tabelle für Kategorien: >50 Tore/Assists pro Club, >10 Tore/Assists pro Saison
+    club_goals = {}
+    club_assists = {}
+    season_goals = {}
+    season_assists = {}
+    tbody = soup.find('tbody')
+    if tbody:
+        for row in tbody.find_all('tr'):
+            row_cells = row.find_all('td')
+            if len(row_cells) > 6:
+                season = row_cells[0].get_text().strip()
+                club_img = row_cells[3].find('img')
+                club_name = club_img['alt'] if club_img and club_img.get('alt') else "Unknown"
+                goals_val = _clean_val(row_cells[5])
+                assists_val = _clean_val(row_cells[6])
+                if club_name != "Unknown":
+                    club_goals[club_name] = club_goals.get(club_name, 0) + goals_val
+                    club_assists[club_name] = club_assists.get(club_name, 0) + assists_val
+                if season:
+                    season_goals[season] = season_goals.get(season, 0) + goals_val
+                    season_assists[season] = season_assists.get(season, 0) + assists_val
+
+    result['club_goals'] = club_goals
+    result['club_assists'] = club_assists
+    result['season_goals'] = season_goals
+    result['season_assists'] = season_assists
+    return result
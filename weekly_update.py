@@ -1,35 +1,42 @@
-import sqlite3
 import cloudscraper
-from bs4 import BeautifulSoup
+import os
 import time
 import random
 import datetime
-import re
 
-DB_NAME = 'schweizer_fussball_grid.db'
+from db_writer import BatchWriter, apply_roster_flags, connect, close, write_snapshot
+from fetch_engine import fetch_all
+from grid_index import build_grid_index
+from schema import DB_NAME, STAT_SNAPSHOTS, ensure_players_columns, ensure_tables
+from tm_html import parse_player_stats, parse_roster_ids
 
 # Wir nutzen eine globale Session für alle Anfragen
 SCRAPER = cloudscraper.create_scraper(browser={'browser': 'chrome', 'platform': 'darwin', 'desktop': True})
 
+# Höflichkeitsabstand zu transfermarkt.ch (vorher feste 3 s Pause pro Seite)
+SCRAPE_RPS = 1 / 3
+
+# Ein gescrapter Spieler kostet ~5 s; ohne Journal geht bei einem Abbruch höchstens
+# ein kleiner Batch verloren (Spieler mit last_updated = heute werden ohnehin übersprungen)
+SCRAPE_BATCH_SIZE = int(os.getenv("SCRAPE_BATCH_SIZE", "5"))
+
+def _scan_roster_page(url):
+    print(f"🔭 Scanne aktuelle Kaderliste: {url}")
+    res = SCRAPER.get(url, timeout=20)
+    return parse_roster_ids(res.content)
+
 def get_current_swiss_ids():
-    """Holt alle IDs von Spielern, die aktuell in SL oder CL gemeldet sind."""
+    """Holt alle IDs von Spielern, die aktuell in SL oder CL gemeldet sind (Seiten parallel, rate-limitiert)."""
     urls = [
         "https://www.transfermarkt.ch/super-league/startseite/wettbewerb/C1",
         "https://www.transfermarkt.ch/challenge-league/startseite/wettbewerb/C2"
     ]
     current_ids = set()
-    for url in urls:
-        print(f"🔭 Scanne aktuelle Kaderliste: {url}")
-        try:
-            res = SCRAPER.get(url, timeout=20)
-            soup = BeautifulSoup(res.content, 'html.parser')
-            links = soup.find_all('a', href=re.compile(r'/profil/spieler/(\d+)'))
-            for link in links:
-                m = re.search(r'/spieler/(\d+)', link['href'])
-                if m: current_ids.add(int(m.group(1)))
-            time.sleep(3)
-        except Exception as e:
-            print(f"❌ Fehler beim Scannen der Ligen: {e}")
+    for url, ids in fetch_all(urls, _scan_roster_page, workers=len(urls), rate=SCRAPE_RPS):
+        if isinstance(ids, Exception):
+            print(f"❌ Fehler beim Scannen der Ligen: {ids}")
+            continue
+        current_ids |= ids
     return current_ids
 
 def get_player_stats(tm_id):
@@ -40,79 +47,25 @@ def get_player_stats(tm_id):
         if res.status_code != 200:
             return None
 
-        soup = BeautifulSoup(res.content, 'html.parser')
-        footer = soup.find('tfoot')
-        if not footer:
-            return None
-
-        def clean_val(v):
-            txt = v.text.strip().replace('.', '').replace(',', '').replace('-', '0')
-            return int(txt) if txt.isdigit() else 0
-
-        cells = footer.find_all('td')
-        if len(cells) <= 6:
-            return None
-
-        result = {'e': clean_val(cells[4]), 't': clean_val(cells[5]), 'a': clean_val(cells[6])}
-
-        # Detaillierte Tabelle für Kategorien: >50 Tore/Assists pro Club, >10 Tore/Assists pro Saison
-        club_goals = {}
-        club_assists = {}
-        season_goals = {}
-        season_assists = {}
-        tbody = soup.find('tbody')
-        if tbody:
-            for row in tbody.find_all('tr'):
-                row_cells = row.find_all('td')
-                if len(row_cells) > 6:
-                    season = row_cells[0].text.strip()
-                    club_img = row_cells[3].find('img')
-                    club_name = club_img['alt'] if club_img and club_img.get('alt') else "Unknown"
-                    goals_val = clean_val(row_cells[5])
-                    assists_val = clean_val(row_cells[6])
-                    if club_name != "Unknown":
-                        club_goals[club_name] = club_goals.get(club_name, 0) + goals_val
-                        club_assists[club_name] = club_assists.get(club_name, 0) + assists_val
-                    if season:
-                        season_goals[season] = season_goals.get(season, 0) + goals_val
-                        season_assists[season] = season_assists.get(season, 0) + assists_val
-
-        result['club_goals'] = club_goals
-        result['club_assists'] = club_assists
-        result['season_goals'] = season_goals
-        result['season_assists'] = season_assists
-        return result
+        return parse_player_stats(res.content)
     except Exception:
         return None
 
 def run_update():
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(DB_NAME)
     cursor = conn.cursor()
 
-    # Schema anpassen
-    try:
-        cursor.execute("ALTER TABLE players ADD COLUMN in_switzerland INTEGER DEFAULT 0")
-    except:
-        pass
-    for table_sql in [
-        "CREATE TABLE IF NOT EXISTS player_club_goals (tm_id INTEGER, club_name TEXT, goals INTEGER, PRIMARY KEY(tm_id, club_name))",
-        "CREATE TABLE IF NOT EXISTS player_club_assists (tm_id INTEGER, club_name TEXT, assists INTEGER, PRIMARY KEY(tm_id, club_name))",
-        "CREATE TABLE IF NOT EXISTS player_season_goals (tm_id INTEGER, season_name TEXT, goals INTEGER, PRIMARY KEY(tm_id, season_name))",
-        "CREATE TABLE IF NOT EXISTS player_season_assists (tm_id INTEGER, season_name TEXT, assists INTEGER, PRIMARY KEY(tm_id, season_name))",
-    ]:
-        cursor.execute(table_sql)
+    # Schema anpassen (gemeinsam mit dem API-Backend, siehe schema.py)
+    ensure_players_columns(cursor)
+    ensure_tables(cursor)
 
     # 1. Alle aktuellen IDs aus den Schweizer Ligen holen
     current_ch_ids = get_current_swiss_ids()
     print(f"✅ {len(current_ch_ids)} Spieler aktuell in der Schweiz gefunden.")
 
-    # 2. Status in der DB aktualisieren
-    # Zuerst alle auf 0 setzen
-    cursor.execute("UPDATE players SET in_switzerland = 0")
-    # Dann die gefundenen auf 1 setzen
-    for tid in current_ch_ids:
-        cursor.execute("UPDATE players SET in_switzerland = 1 WHERE tm_id = ?", (tid,))
-    conn.commit()
+    # 2. Status in der DB aktualisieren (Mengen-Diff: nur geänderte Flags werden geschrieben)
+    flagged, cleared = apply_roster_flags(conn, current_ch_ids)
+    print(f"🇨🇭 in_switzerland: +{flagged} / -{cleared}")
 
     # 3. Nur Spieler scrapen, die in der Schweiz spielen (in_switzerland = 1)
     # Und die noch nicht heute aktualisiert wurden
@@ -122,43 +75,34 @@ def run_update():
 
     print(f"🔄 Starte Update für {len(to_scrape)} Spieler mit Schweizer Einsätzen...")
 
+    # Schreiben gebündelt: Zeilen sammeln, alle SCRAPE_BATCH_SIZE Spieler per executemany in einer Transaktion
+    writer = BatchWriter(conn, batch_size=SCRAPE_BATCH_SIZE)
     for i, (tid, name) in enumerate(to_scrape):
         print(f"[{i+1}/{len(to_scrape)}] ⚽ Scrape: {name}")
         stats = get_player_stats(tid)
         
         if stats:
-            cursor.execute("""
+            writer.add("""
                 UPDATE players 
                 SET total_einsaetze = ?, total_tore = ?, total_assists = ?, last_updated = ?
                 WHERE tm_id = ?
             """, (stats['e'], stats['t'], stats['a'], today, tid))
-            # Kategorien-Tabellen aktualisieren
-            for club_name, goals in stats.get('club_goals', {}).items():
-                if goals > 0:
-                    cursor.execute(
-                        "INSERT INTO player_club_goals (tm_id, club_name, goals) VALUES (?,?,?) ON CONFLICT(tm_id, club_name) DO UPDATE SET goals=excluded.goals",
-                        (tid, club_name, goals))
-            for club_name, assists in stats.get('club_assists', {}).items():
-                if assists > 0:
-                    cursor.execute(
-                        "INSERT INTO player_club_assists (tm_id, club_name, assists) VALUES (?,?,?) ON CONFLICT(tm_id, club_name) DO UPDATE SET assists=excluded.assists",
-                        (tid, club_name, assists))
-            for season_name, goals in stats.get('season_goals', {}).items():
-                if goals > 0:
-                    cursor.execute(
-                        "INSERT INTO player_season_goals (tm_id, season_name, goals) VALUES (?,?,?) ON CONFLICT(tm_id, season_name) DO UPDATE SET goals=excluded.goals",
-                        (tid, season_name, goals))
-            for season_name, assists in stats.get('season_assists', {}).items():
-                if assists > 0:
-                    cursor.execute(
-                        "INSERT INTO player_season_assists (tm_id, season_name, assists) VALUES (?,?,?) ON CONFLICT(tm_id, season_name) DO UPDATE SET assists=excluded.assists",
-                        (tid, season_name, assists))
-            conn.commit()
+            # Kategorien-Tabellen als Snapshot: verschwundene Clubs/Saisons werden entfernt.
+            # Der Scraper liefert nur Club-/Saison-Tore und -Assists; die übrigen Tabellen bleiben unberührt.
+            for table, key_col, value_col, key in STAT_SNAPSHOTS:
+                if key not in stats:
+                    continue
+                write_snapshot(writer, table, key_col, value_col, tid,
+                               {label: value for label, value in stats.get(key, {}).items() if value > 0})
+            writer.end_player()
         
         # Moderate Pause
         time.sleep(random.uniform(4, 7))
 
-    conn.close()
+    writer.flush()
+    # Vorberechnete Lookup-Tabellen für die Grid-Prüfung (server.js) neu aufbauen
+    build_grid_index(conn)
+    close(conn)
     print("🎉 Wöchentliches Schweizer Update abgeschlossen.")
 
 if __name__ == "__main__":
@@ -1,52 +1,111 @@
-import sqlite3
 import datetime
-import random
+import os
+import subprocess
+import sys
 import time
-import requests
 
-from weekly_update import DB_NAME
-from api_stats import get_player_stats, API_BASE
+from schema import (
+    DB_NAME, SHARD_TABLES, STAT_SNAPSHOTS, ensure_club_cache_table, ensure_players_columns, ensure_tables,
+)
+from api_stats import (
+    aggregate_player_stats_batch, fetch_player_stats_payload, stats_fingerprint,
+    load_club_cache, save_club_cache, use_offline_club_names, API_BASE,
+)
+from api_discovery import get_current_swiss_ids_via_api, iter_swiss_ids_via_api
+import metrics
+from http_client import api_get
+from fetch_engine import API_RPS, TokenBucket, fetch_all, prioritized
+from db_writer import BatchWriter, apply_roster_flags, connect, close, set_roster_flags, write_key_set, write_snapshot
+from grid_index import build_grid_index, ensure_grid_index_tables, write_grid_index
+from payload_archive import (
+    ARCHIVE_DB, PLAYER_STATS, CLUB_PROFILE, attach_archive, archive_payload, archived_keys, iter_latest, save_pending,
+)
+from shards import finished_on_roster, load_roster, merge_shards, prepare_shard, roster_path, save_roster, shard_path
+from run_journal import (
+    ensure_journal_tables, start_run, find_resumable_run, load_run_roster,
+    mark_player_done, save_run_roster, finish_run,
+)
+from retry_queue import (
+    RETRY_PASSES, backoff_delay, clear_failure, ensure_retry_table, is_retryable,
+    load_queue, prune_queue, record_failure, split_queue,
+)
 
 MIN_EXPECTED_SWISS_IDS = 120
 
 
-def ensure_players_columns(cur):
-    cur.execute("PRAGMA table_info(players)")
-    cols = {r[1] for r in cur.fetchall()}
-    if "in_switzerland" not in cols:
-        cur.execute("ALTER TABLE players ADD COLUMN in_switzerland INTEGER DEFAULT 0")
-    if "last_updated" not in cols:
-        cur.execute("ALTER TABLE players ADD COLUMN last_updated TEXT")
-
-
-def ensure_tables(cur):
-    for sql in [
-        "CREATE TABLE IF NOT EXISTS player_club_goals (tm_id INTEGER, club_name TEXT, goals INTEGER, PRIMARY KEY(tm_id, club_name))",
-        "CREATE TABLE IF NOT EXISTS player_club_assists (tm_id INTEGER, club_name TEXT, assists INTEGER, PRIMARY KEY(tm_id, club_name))",
-        "CREATE TABLE IF NOT EXISTS player_club_appearances (tm_id INTEGER, club_name TEXT, appearances INTEGER, PRIMARY KEY(tm_id, club_name))",
-        "CREATE TABLE IF NOT EXISTS player_club_yellow_cards (tm_id INTEGER, club_name TEXT, yellow_cards INTEGER, PRIMARY KEY(tm_id, club_name))",
-        "CREATE TABLE IF NOT EXISTS player_club_red_cards (tm_id INTEGER, club_name TEXT, red_cards INTEGER, PRIMARY KEY(tm_id, club_name))",
-        "CREATE TABLE IF NOT EXISTS player_club_last_season (tm_id INTEGER, club_name TEXT, last_season_year INTEGER, PRIMARY KEY(tm_id, club_name))",
-        "CREATE TABLE IF NOT EXISTS player_season_goals (tm_id INTEGER, season_name TEXT, goals INTEGER, PRIMARY KEY(tm_id, season_name))",
-        "CREATE TABLE IF NOT EXISTS player_season_assists (tm_id INTEGER, season_name TEXT, assists INTEGER, PRIMARY KEY(tm_id, season_name))",
-        "CREATE TABLE IF NOT EXISTS player_leagues (tm_id INTEGER, league_code TEXT)",
-    ]:
-        cur.execute(sql)
-
-
-def upsert_club_stat(cur, tid, table, col, data):
-    for club_name, value in (data or {}).items():
-        if value and int(value) > 0:
-            cur.execute(
-                f"INSERT INTO {table} (tm_id, club_name, {col}) VALUES (?, ?, ?) "
-                f"ON CONFLICT(tm_id, club_name) DO UPDATE SET {col}=excluded.{col}",
-                (tid, club_name, int(value))
-            )
+def write_player_stats(writer, tid, stats, today):
+    """
+    Queue one player's aggregated stats (totals, leagues, club and season
+    tables) on `writer`. Each table is written as a snapshot diff: rows that
+    vanished from the stats are deleted, unchanged rows are not rewritten.
+    """
+    # Update core totals + stamp
+    writer.add(
+        "UPDATE players SET total_einsaetze=?, total_tore=?, total_assists=?, last_updated=? WHERE tm_id=?",
+        (stats.get("e", 0), stats.get("t", 0), stats.get("a", 0), today, tid)
+    )
+
+    write_key_set(writer, "player_leagues", "league_code", tid,
+                  [league_name for league_name in stats.get("leagues", []) or [] if league_name])
+    write_snapshot(writer, "player_club_last_season", "club_name", "last_season_year", tid,
+                   {club_name: int(last_year)
+                    for club_name, last_year in (stats.get("club_last_season_year", {}) or {}).items() if last_year})
+
+    for table, key_col, value_col, key in STAT_SNAPSHOTS:
+        write_snapshot(writer, table, key_col, value_col, tid,
+                       {name: int(value) for name, value in (stats.get(key) or {}).items() if value and int(value) > 0})
+
+
+def save_caches(conn):
+    """BatchWriter flush hook: persist new club names and archived club profiles."""
+    save_club_cache(conn)
+    save_pending(conn)
+
+
+def load_fetch_states(cur):
+    """tm_id -> (fingerprint, etag, last_modified) of the last stored stats payload."""
+    cur.execute("SELECT tm_id, fingerprint, etag, last_modified FROM player_fetch_state")
+    return {r[0]: (r[1], r[2], r[3]) for r in cur.fetchall()}
+
+
+def save_fetch_state(writer, tid, state, changed_at):
+    fingerprint, etag, last_modified = state
+    writer.add(
+        "INSERT INTO player_fetch_state (tm_id, fingerprint, etag, last_modified, changed_at) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(tm_id) DO UPDATE SET fingerprint=excluded.fingerprint, etag=excluded.etag, "
+        "last_modified=excluded.last_modified, changed_at=COALESCE(excluded.changed_at, changed_at)",
+        (tid, fingerprint, etag, last_modified, changed_at)
+    )
+
+
+def fetch_player_update(tid, state=None, conditional=True):
+    """
+    Conditional stats fetch for one player (runs in a worker thread).
+    Returns ("unchanged", None, state) when the API answers 304,
+    ("unchanged", data, state) when the payload fingerprint matches `state`,
+    ("changed", data, state) with the raw payload otherwise (aggregated in
+    batches by the caller), ("failed", error, state) with the structured
+    error of `fetch_player_stats_payload`. `conditional=False` skips the
+    validators, so the body comes back even if it did not change.
+    """
+    fingerprint, etag, last_modified = state or (None, None, None)
+    if conditional:
+        payload = fetch_player_stats_payload(tid, etag, last_modified)
+    else:
+        payload = fetch_player_stats_payload(tid)
+    if payload["error"]:
+        return "failed", payload, state
+    if payload["not_modified"]:
+        return "unchanged", None, (fingerprint, etag, last_modified)
+    new_state = (stats_fingerprint(payload["data"]), payload["etag"], payload["last_modified"])
+    if fingerprint and new_state[0] == fingerprint:
+        return "unchanged", payload["data"], new_state
+    return "changed", payload["data"], new_state
 
 
 def check_api_health():
     try:
-        resp = requests.get(f"{API_BASE}/docs", timeout=15)
+        resp = api_get("/docs", "docs")
         if resp.status_code != 200:
             print(f"❌ API health check failed: {API_BASE}/docs -> HTTP {resp.status_code}")
             return False
@@ -57,170 +116,405 @@ def check_api_health():
         return False
 
 
-def debug_stats_endpoint(tm_id):
-    """Direct diagnostics for /players/{id}/stats when get_player_stats returns None."""
-    url = f"{API_BASE}/players/{tm_id}/stats"
-    try:
-        resp = requests.get(url, timeout=20)
-        body = (resp.text or "").replace("\n", " ")[:240]
-        return resp.status_code, body
-    except Exception as e:
-        return None, f"request_exception: {e}"
-
-
-def get_current_swiss_ids_via_api():
+def run_weekly_api_update(full_refresh=False, resume=False, shard=None, roster=None):
     """
-    Fetch currently listed players for Swiss Super League (C1)
-    and Challenge League (C2) via API (no HTML scraping).
+    Weekly API refresh. With `resume=True` the latest interrupted run is
+    continued from its journal: finished players are skipped and, if its
+    roster was already complete, discovery is not repeated.
+    With `shard=(k, n)` only players with tm_id % n == k - 1 are updated,
+    into the shard DB (see `shards`); `merge_shard_updates(n)` applies them.
+    A given `roster` (tm_ids) is taken as the complete roster of a new run
+    instead of discovering it.
+    A JSON run report (see `metrics`) is written whether the run succeeds or not.
     """
-    ids = set()
-    competitions = ["C1", "C2"]
-
-    for comp_id in competitions:
-        clubs_url = f"{API_BASE}/competitions/{comp_id}/clubs"
-        try:
-            r = requests.get(clubs_url, timeout=25)
-            if r.status_code != 200:
-                print(f"❌ Clubs API failed for {comp_id}: HTTP {r.status_code}")
-                continue
-            clubs = (r.json() or {}).get("clubs") or []
-            print(f"ℹ️ Competition {comp_id}: {len(clubs)} clubs")
-        except Exception as e:
-            print(f"❌ Clubs API exception for {comp_id}: {e}")
-            continue
-
-        for club in clubs:
-            club_id = str(club.get("id") or "").strip()
-            if not club_id:
-                continue
-            players_url = f"{API_BASE}/clubs/{club_id}/players"
-            try:
-                rp = requests.get(players_url, timeout=25)
-                if rp.status_code != 200:
-                    print(f"❌ Players API failed for club {club_id}: HTTP {rp.status_code}")
-                    continue
-                players = (rp.json() or {}).get("players") or []
-                for p in players:
-                    pid = p.get("id")
-                    if pid is not None and str(pid).isdigit():
-                        ids.add(int(pid))
-            except Exception as e:
-                print(f"❌ Players API exception for club {club_id}: {e}")
-                continue
+    report_path = shard_path(*shard, "report.json") if shard else metrics.RUN_REPORT_PATH
+    _reported(report_path, _run_update, full_refresh, resume, shard, roster)
 
-            time.sleep(random.uniform(0.2, 0.6))
 
-    return ids
-
-
-def run_weekly_api_update():
-    conn = sqlite3.connect(DB_NAME)
+def _reported(report_path, fn, *args):
+    """Run `fn(*args)` and write the JSON run report to `report_path` whether it succeeds or not."""
+    metrics.reset()
+    status = "error"
+    try:
+        result = fn(*args)
+        status = "ok"
+        return result
+    except Exception as e:
+        status = f"error: {e}"
+        raise
+    finally:
+        report = metrics.write_report(
+            report_path,
+            status=status,
+            club_cache_hit_ratio=metrics.ratio("club_cache.hits", "club_cache.misses"),
+        )
+        print(f"Run report: {report_path} (wall {report['wall_s']} s)")
+
+
+def _run_update(full_refresh, resume, shard=None, roster=None):
+    db_name, archive_path = DB_NAME, None
+    if shard:
+        db_name, archive_path = shard_path(*shard), shard_path(*shard, "archive.db")
+        if not (resume and os.path.exists(db_name)):
+            prepare_shard(DB_NAME, *shard, SHARD_TABLES)
+        print(f"Shard {shard[0]}/{shard[1]}: {db_name}")
+        metrics.set_info("shard", f"{shard[0]}/{shard[1]}")
+    conn = connect(db_name)
+    attach_archive(conn, archive_path)
     cur = conn.cursor()
 
     ensure_players_columns(cur)
     ensure_tables(cur)
+    ensure_journal_tables(cur)
+    ensure_retry_table(cur)
 
     if not check_api_health():
         conn.close()
         raise RuntimeError(f"API_BASE is not reachable: {API_BASE}")
 
-    # 1) Detect currently listed Swiss-league players via API
-    swiss_ids = get_current_swiss_ids_via_api()
-    print(f"Swiss-listed players found (API): {len(swiss_ids)}")
+    print(f"Club names preloaded from cache: {load_club_cache(conn)}")
+
+    previous = find_resumable_run(cur) if resume else None
+    if previous:
+        run_id, roster_complete = previous
+        journal = load_run_roster(cur, run_id)
+        print(f"Resuming run {run_id}: {sum(journal.values())} players already done")
+    else:
+        if resume:
+            print("No interrupted run to resume, starting a new one")
+        run_id, roster_complete, journal = start_run(conn), False, {}
+        if roster is not None:
+            save_run_roster(conn, run_id, roster)
+            roster_complete, journal = True, dict.fromkeys(roster, False)
+    metrics.set_info("run_id", run_id)
+    metrics.set_info("resumed", bool(previous))
+
+    # 1) Stream currently listed Swiss-league players (API) straight into the stats stage;
+    #    roster and stats requests share one rate limit. Among the ids found so far the
+    #    most recently active players go first. A resumed run with a journaled
+    #    roster skips discovery.
+    today = datetime.date.today().isoformat()
+    cur.execute("SELECT tm_id, name FROM players")
+    names = dict(cur.fetchall())
+    cur.execute("SELECT tm_id, MAX(last_season_year) FROM player_club_last_season GROUP BY tm_id")
+    last_season = dict(cur.fetchall())
+    swiss_ids = set(journal) if roster_complete else set()
+    limiter = TokenBucket(API_RPS)
+
+    def _discovered():
+        roster = list(swiss_ids) if roster_complete else iter_swiss_ids_via_api(limiter)
+        t0 = time.perf_counter()
+        for tid in roster:
+            swiss_ids.add(tid)
+            if tid in names and not journal.get(tid) and tid not in from_queue:
+                yield tid
+        metrics.add_time("discovery", time.perf_counter() - t0)
+
+    ok = 0
+    unchanged = 0
+    # tm_id -> structured error of the player's latest failed fetch in this run
+    failures = {}
+    queued = load_queue(cur)
+    # Due entries get their own pass before the roster stream; held ones (permanent
+    # failures in backoff, or parked) are not requested in this run at all
+    due, held = split_queue(queued, today)
+    due = [tid for tid in sorted(due) if tid in names and not journal.get(tid)
+           and (not roster_complete or tid in swiss_ids)]
+    from_queue = held.union(due)
+    if queued:
+        print(f"Players in the retry queue from earlier runs: {len(queued)} ({len(due)} due, {len(held)} held)")
+
+    # Skip DB work for players whose stats payload is unchanged since the last run
+    states = {} if full_refresh else load_fetch_states(cur)
+
+    # Players without any archived payload are fetched unconditionally once, so the
+    # archive covers unchanged players too (shards check the main archive)
+    archived = {int(key) for key in archived_keys(PLAYER_STATS, ARCHIVE_DB)}
+
+    def _fetch(tid):
+        return fetch_player_update(tid, states.get(tid), conditional=tid in archived)
+
+    # Fetch concurrently (bounded pool + token bucket), write from this thread only in batches
+    writer = BatchWriter(conn, on_flush=save_caches)
+    changed = {}
+
+    def _write_changed():
+        # Aggregate changed payloads together (one grouped pass, one club-name batch)
+        nonlocal ok
+        with metrics.timed("aggregation"):
+            stats_by_tid = aggregate_player_stats_batch({tid: data for tid, (data, _) in changed.items()}, limiter=limiter)
+        for tid, (data, state) in changed.items():
+            if stats_by_tid[tid] is None:
+                # Malformed payload: nothing is written, the player goes to the retry queue
+                failures[tid] = {"error": "parse", "status": None, "detail": "stats payload could not be aggregated"}
+                print(f"   ⚠️ {names[tid]} ({tid}): stats payload could not be aggregated")
+                continue
+            ok += 1
+            if tid in queued:
+                clear_failure(writer, tid)
+            archive_payload(writer, PLAYER_STATS, tid, data, today, state[0])
+            write_player_stats(writer, tid, stats_by_tid[tid], today)
+            if stats_by_tid[tid]["unresolved_clubs"]:
+                # Rows hold Verein_{id} placeholders of transiently failed lookups: drop
+                # fingerprint and validators so the next run re-aggregates the player once
+                # the names resolve (permanent failures like a 404 profile keep the skip)
+                metrics.incr("players.unresolved_club_names")
+                state = (None, None, None)
+            save_fetch_state(writer, tid, state, today)
+            mark_player_done(writer, run_id, tid)
+            writer.end_player()
+        changed.clear()
+
+    def _process(tid, result, label):
+        # Failures are only queued here; no diagnostic re-request, no sleep in the fetch loop
+        nonlocal unchanged
+        name = names[tid]
+        if isinstance(result, Exception):
+            result = "failed", {"error": "exception", "status": None, "detail": str(result)[:240]}, None
+        change, data, state = result
+        if change == "failed":
+            failures[tid] = data
+            print(f"{label} {name} ({tid}) failed: {data['error']} status={data['status']} {data['detail'][:80]}")
+            return
+        failures.pop(tid, None)
+        if change == "unchanged":
+            unchanged += 1
+            if data is not None and tid not in archived:
+                archive_payload(writer, PLAYER_STATS, tid, data, today, state[0])
+            if tid in queued:
+                clear_failure(writer, tid)
+            if state != states.get(tid):
+                save_fetch_state(writer, tid, state, None)
+            mark_player_done(writer, run_id, tid)
+            writer.end_player()
+            return
+
+        print(f"{label} {name} ({tid}) changed")
+        changed[tid] = (data, state)
+        if len(changed) >= writer.batch_size:
+            _write_changed()
+
+    def _priority(tid):
+        # Most recently active first; players never aggregated before lead the queue
+        return -(last_season.get(tid) or 9999), tid
+
+    done = 0
+    fetch_started = time.perf_counter()
+    if due:
+        with metrics.timed("retry_queue"):
+            for tid, result in fetch_all(due, _fetch, limiter=limiter):
+                done += 1
+                _process(tid, result, f"[queue {done}]")
+    for tid, result in fetch_all(prioritized(_discovered(), _priority), _fetch, limiter=limiter):
+        done += 1
+        _process(tid, result, f"[{done}]")
+    if changed:
+        _write_changed()
+    writer.flush()
+    metrics.add_time("fetch", time.perf_counter() - fetch_started)
+
+    # Deferred passes over the failures with doubling backoff, same rate limit
+    first_failed = len(failures)
+    for retry_pass in range(1, RETRY_PASSES + 1):
+        pending = [tid for tid, error in failures.items() if is_retryable(error)]
+        if not pending:
+            break
+        delay = backoff_delay(retry_pass)
+        print(f"Retry pass {retry_pass}: {len(pending)} players after {delay:.0f} s")
+        time.sleep(delay)
+        with metrics.timed("retry"):
+            for tid, result in fetch_all(pending, _fetch, limiter=limiter):
+                _process(tid, result, f"[retry {retry_pass}]")
+            if changed:
+                _write_changed()
+    for tid, error in failures.items():
+        record_failure(writer, tid, error, today)
+    writer.flush()
+    fail = len(failures)
+    metrics.set_info("retry_queue", {
+        "queued_before": len(queued), "due": len(due), "held": len(held),
+        "recovered": first_failed - fail, "failed": fail,
+    })
+    with conn:
+        save_caches(conn)
+    if not roster_complete:
+        save_run_roster(conn, run_id, swiss_ids)
+    print(f"Swiss-listed players found (API): {len(swiss_ids)}, checked: {done}")
+    metrics.set_info("players", {"roster": len(swiss_ids), "checked": done, "updated": ok, "unchanged": unchanged, "failed": fail})
 
     if len(swiss_ids) < MIN_EXPECTED_SWISS_IDS:
-        conn.close()
+        finish_run(conn, run_id, "aborted")
+        close(conn)
         raise RuntimeError(
             f"Swiss-listed player count too low ({len(swiss_ids)}). "
             "Aborting to avoid bad update. Check API/rate limits."
         )
 
-    # 2) Update in_switzerland flags
-    cur.execute("UPDATE players SET in_switzerland = 0")
-    cur.executemany("UPDATE players SET in_switzerland = 1 WHERE tm_id = ?", [(i,) for i in swiss_ids])
-    conn.commit()
+    removed = prune_queue(conn, swiss_ids, today)
+    if removed:
+        print(f"Retry queue: dropped {removed} players no longer listed or expired")
+
+    # 2) Update in_switzerland flags only once the full roster is known
+    #    (shards: done by the merge from the union of all shard rosters)
+    if not shard:
+        flagged, cleared = apply_roster_flags(conn, swiss_ids)
+        print(f"in_switzerland flags changed: +{flagged} / -{cleared}")
+
+        # 3) Rebuild the precomputed grid lookup tables for server.js
+        with metrics.timed("grid_index"):
+            metrics.set_info("grid_index", build_grid_index(conn))
+    finish_run(conn, run_id)
+    close(conn)
+    print(f"Done. Updated: {ok}, Unchanged: {unchanged}, Failed: {fail}")
+
+    if failures:
+        sample = ", ".join(f"{names[tid]} ({tid}) [{error['error']} status={error['status']}]"
+                           for tid, error in list(failures.items())[:10])
+        print(f"Queued for the next run: {sample}")
+
+    # A resumed run may legitimately find nothing left to check
+    if ok + unchanged == 0 and (done or not previous):
+        raise RuntimeError("No successful player updates. Failing run intentionally.")
 
-    # 3) Refresh only Swiss-listed players
-    today = datetime.date.today().isoformat()
-    cur.execute("SELECT tm_id, name FROM players WHERE in_switzerland = 1 ORDER BY tm_id")
-    to_update = cur.fetchall()
-    print(f"Players to update via API: {len(to_update)}")
 
-    ok = 0
-    fail = 0
-    failed_players = []
-
-    for idx, (tid, name) in enumerate(to_update, 1):
-        print(f"[{idx}/{len(to_update)}] {name} ({tid})")
-        stats = get_player_stats(tid)
-        if not stats:
-            fail += 1
-            status, detail = debug_stats_endpoint(tid)
-            print(f"   ⚠️ API stats missing for {name} ({tid}) | endpoint_status={status} | detail={detail}")
-            failed_players.append((tid, name, status))
-            time.sleep(random.uniform(0.8, 1.8))
-            continue
+def merge_shard_updates(count):
+    """
+    Apply the finished shard DBs 1..`count` to DB_NAME in one transaction,
+    together with the in_switzerland flags from the merged roster and the
+    rebuilt grid index: the main DB never holds a half-merged state.
+    Writes the run report (merge and grid index timings).
+    """
+    return _reported(metrics.RUN_REPORT_PATH, _merge_shard_updates, count)
 
-        # Update core totals + stamp
-        cur.execute(
-            "UPDATE players SET total_einsaetze=?, total_tore=?, total_assists=?, last_updated=? WHERE tm_id=?",
-            (stats.get("e", 0), stats.get("t", 0), stats.get("a", 0), today, tid)
-        )
 
-        # Replace league snapshot
-        cur.execute("DELETE FROM player_leagues WHERE tm_id = ?", (tid,))
-        for league_name in stats.get("leagues", []) or []:
-            if league_name:
-                cur.execute("INSERT INTO player_leagues (tm_id, league_code) VALUES (?, ?)", (tid, league_name))
-
-        # Replace last-season-per-club snapshot
-        cur.execute("DELETE FROM player_club_last_season WHERE tm_id = ?", (tid,))
-        for club_name, last_year in (stats.get("club_last_season_year", {}) or {}).items():
-            if last_year:
-                cur.execute(
-                    "INSERT INTO player_club_last_season (tm_id, club_name, last_season_year) VALUES (?, ?, ?) "
-                    "ON CONFLICT(tm_id, club_name) DO UPDATE SET last_season_year=excluded.last_season_year",
-                    (tid, club_name, int(last_year))
-                )
-
-        # Club stats
-        upsert_club_stat(cur, tid, "player_club_goals", "goals", stats.get("club_goals"))
-        upsert_club_stat(cur, tid, "player_club_assists", "assists", stats.get("club_assists"))
-        upsert_club_stat(cur, tid, "player_club_appearances", "appearances", stats.get("club_appearances"))
-        upsert_club_stat(cur, tid, "player_club_yellow_cards", "yellow_cards", stats.get("club_yellow_cards"))
-        upsert_club_stat(cur, tid, "player_club_red_cards", "red_cards", stats.get("club_red_cards"))
-
-        # Season stats
-        for season_name, goals in (stats.get("season_goals", {}) or {}).items():
-            if goals and int(goals) > 0:
-                cur.execute(
-                    "INSERT INTO player_season_goals (tm_id, season_name, goals) VALUES (?, ?, ?) "
-                    "ON CONFLICT(tm_id, season_name) DO UPDATE SET goals=excluded.goals",
-                    (tid, season_name, int(goals))
-                )
-
-        for season_name, assists in (stats.get("season_assists", {}) or {}).items():
-            if assists and int(assists) > 0:
-                cur.execute(
-                    "INSERT INTO player_season_assists (tm_id, season_name, assists) VALUES (?, ?, ?) "
-                    "ON CONFLICT(tm_id, season_name) DO UPDATE SET assists=excluded.assists",
-                    (tid, season_name, int(assists))
-                )
-
-        conn.commit()
-        ok += 1
-        time.sleep(random.uniform(0.8, 1.8))
-
-    conn.close()
-    print(f"Done. Success: {ok}, Failed: {fail}")
-
-    if failed_players:
-        sample = ", ".join([f"{n} ({tid}) [status={status}]" for tid, n, status in failed_players[:10]])
-        print(f"Failed sample: {sample}")
-
-    if ok == 0:
-        raise RuntimeError("No successful player updates. Failing run intentionally.")
+def _merge_shard_updates(count):
+    metrics.set_info("shards", count)
+    conn = connect(DB_NAME)
+    attach_archive(conn)
+    cur = conn.cursor()
+    ensure_players_columns(cur)
+    ensure_tables(cur)
+    ensure_club_cache_table(cur)
+    ensure_retry_table(cur)
+    ensure_grid_index_tables(cur)
+
+    def _finalize(conn, roster):
+        # Raising here rolls back the whole merge
+        if len(roster) < MIN_EXPECTED_SWISS_IDS:
+            raise RuntimeError(f"Merged Swiss-listed player count too low ({len(roster)}), nothing merged.")
+        flagged, cleared = set_roster_flags(conn, roster)
+        print(f"in_switzerland flags changed: +{flagged} / -{cleared}")
+        with metrics.timed("grid_index"):
+            metrics.set_info("grid_index", write_grid_index(conn))
+
+    try:
+        with metrics.timed("shard_merge"):
+            roster, changed = merge_shards(conn, count, SHARD_TABLES, finalize=_finalize)
+    finally:
+        close(conn)
+    print(f"Merged {count} shards: {changed} rows changed, roster {len(roster)}")
+    return changed
+
+
+def run_sharded_update(count, full_refresh=False, resume=False):
+    """
+    Run `count` shard workers as local subprocesses (the API rate limit is
+    split between them) and merge them once all succeeded. The roster is
+    discovered once up front and handed to every worker; a resumed run
+    reuses the roster file of the interrupted one and only restarts the
+    shards that did not finish on it. The coordinator writes the main run
+    report (discovery, merge); each worker writes its own shard report.
+    """
+    return _reported(metrics.RUN_REPORT_PATH, _run_sharded_update, count, full_refresh, resume)
+
+
+def _run_sharded_update(count, full_refresh, resume):
+    roster_file = roster_path(count)
+    if not (resume and os.path.exists(roster_file)):
+        with metrics.timed("discovery"):
+            roster = get_current_swiss_ids_via_api()
+        if len(roster) < MIN_EXPECTED_SWISS_IDS:
+            raise RuntimeError(f"Swiss-listed player count too low ({len(roster)}). Not starting shard workers.")
+        save_roster(roster_file, roster)
+    roster = load_roster(roster_file)
+    print(f"Roster for {count} shards: {len(roster)} players ({roster_file})")
+    metrics.set_info("shards", count)
+    metrics.set_info("players", {"roster": len(roster)})
+    pending = list(range(1, count + 1))
+    if resume:
+        pending = [k for k in pending if not finished_on_roster(k, count, roster)]
+        if len(pending) < count:
+            print(f"Shards already finished on this roster, not rerun: {sorted(set(range(1, count + 1)) - set(pending))}")
+    metrics.set_info("shards_run", pending)
+    env = dict(os.environ, API_RPS=str(API_RPS / count))
+    cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py"), "update", "--backend", "api"]
+    flags = ["--roster", roster_file] + (["--full-refresh"] if full_refresh else []) + (["--resume"] if resume else [])
+    with metrics.timed("shard_workers"):
+        workers = {k: subprocess.Popen(cmd + ["--shard", f"{k}/{count}", *flags], env=env) for k in pending}
+        failed = [k for k, proc in workers.items() if proc.wait() != 0]
+    if failed:
+        raise RuntimeError(f"Shard workers failed: {failed}; rerun with --resume to finish only those before merging")
+    return _merge_shard_updates(count)
+
+
+def rebuild_from_archive():
+    """
+    Offline rebuild: re-aggregate the latest archived stats payload of every
+    known player and rewrite all derived tables and the grid index, without
+    any API request. Club names come from the archived profiles and the
+    club_names cache; players without an archived payload keep their rows
+    (every API run archives players it has not archived before).
+    """
+    conn = connect(DB_NAME)
+    attach_archive(conn)
+    cur = conn.cursor()
+    ensure_players_columns(cur)
+    ensure_tables(cur)
+    ensure_club_cache_table(cur)
+
+    cur.execute("SELECT club_id, name FROM club_names WHERE ok = 1")
+    club_names = dict(cur.fetchall())
+    club_names.update({club_id: (data or {}).get("name") for club_id, _, data in iter_latest(conn, CLUB_PROFILE)})
+    use_offline_club_names(club_names)
+
+    cur.execute("SELECT tm_id FROM players")
+    known = {r[0] for r in cur.fetchall()}
+    writer = BatchWriter(conn)
+    batch = {}
+
+    def _write_batch():
+        with metrics.timed("aggregation"):
+            stats_by_tid = aggregate_player_stats_batch({tid: data for tid, (data, _) in batch.items()})
+        for tid, (_, fetched_at) in batch.items():
+            if stats_by_tid[tid] is None:
+                print(f"⚠️ Archived payload of {tid} could not be aggregated, rows kept")
+                continue
+            write_player_stats(writer, tid, stats_by_tid[tid], fetched_at)
+            writer.end_player()
+        batch.clear()
+
+    rebuilt = 0
+    for key, fetched_at, data in iter_latest(conn, PLAYER_STATS):
+        tid = int(key)
+        if tid not in known:
+            continue
+        batch[tid] = (data, fetched_at)
+        rebuilt += 1
+        if len(batch) >= writer.batch_size:
+            _write_batch()
+    if batch:
+        _write_batch()
+    writer.flush()
+
+    with metrics.timed("grid_index"):
+        build_grid_index(conn)
+    close(conn)
+    print(f"Rebuilt {rebuilt} players from {len(club_names)} club names (offline)")
+    return rebuilt
 
 
 if __name__ == "__main__":
-    run_weekly_api_update()
+    # Kept as a shortcut for `cli.py update --backend api`; all options live in cli.py
+    import cli
+
+    cli.main(["update", "--backend", "api", *sys.argv[1:]])